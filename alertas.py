@@ -0,0 +1,234 @@
+"""
+Motor local de alertas de recategorización.
+
+Mantiene una cartera de contribuyentes con su facturación mensual agregada y
+re-evalúa periódicamente los umbrales de la Sección 6 de la app (exceso y 80%
+del límite) solo para los clientes cuyos datos cambiaron desde la última
+corrida. Cada cruce de umbral se escribe como un archivo JSON en el outbox,
+desde donde otro proceso puede enviarlo por email.
+
+Los contribuyentes se guardan en el archivo de cartera (lo escribe `cargar`) y
+el resultado de cada evaluación en <cartera>.evaluaciones.json (lo escribe la
+ronda), así una ronda nunca pisa los meses que `cargar` agregó mientras corría.
+Cada contribuyente lleva una versión que sube cuando cambian sus datos; una
+ronda re-evalúa los que cambiaron de versión desde su última evaluación, o
+todos si cambió la tabla de categorías.
+
+    python alertas.py cargar cartera.json export.csv --cuit 20123456789 --nombre "Juan Pérez" --categoria B
+    python alertas.py ejecutar cartera.json --outbox outbox/ --intervalo 3600
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime
+
+from calculos import (
+    CATEGORIAS,
+    calcular_margen_disponible,
+    calcular_exceso_facturacion,
+    determinar_estado_alerta,
+    determinar_categoria_encuadre
+)
+from perfilado import informar, perfilar
+from procesamiento import (
+    calcular_meses_restantes,
+    leer_csv_arca,
+    obtener_inicio_periodo_recategorizacion,
+    obtener_proxima_recategorizacion,
+    procesar_comprobantes
+)
+
+# Orden de gravedad de los estados: solo se alerta cuando el estado empeora
+SEVERIDAD = {'favorable': 0, 'proximidad': 1, 'exceso': 2}
+
+
+def _escribir_json(ruta, datos):
+    """Escribe un JSON de forma atómica (archivo temporal + rename)"""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, ruta)
+
+def huella_categorias(categorias=CATEGORIAS):
+    """
+    Huella de la tabla de categorías completa (el límite propio y los de la categoría
+    de encuadre), así una actualización de ARCA vuelve a evaluar a todos
+    """
+    return hashlib.sha1(json.dumps(sorted(categorias.items())).encode('utf-8')).hexdigest()
+
+def meses_desde_facturacion_mensual(facturacion_mensual):
+    """Convierte la facturación mensual de procesar_csv en {'YYYY-MM': importe}"""
+    return {mes: float(importe) for mes, importe in zip(facturacion_mensual['Mes_Str'], facturacion_mensual['Imp. Total'])}
+
+
+class Cartera:
+    """Cartera de contribuyentes persistida en un archivo JSON local"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.ruta_evaluaciones = f"{os.path.splitext(ruta)[0]}.evaluaciones.json"
+        self.contribuyentes = {}
+        self.evaluaciones = {}
+        datos = {}
+        if os.path.exists(ruta):
+            with open(ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+            self.contribuyentes = datos.get('contribuyentes', {})
+        if os.path.exists(self.ruta_evaluaciones):
+            with open(self.ruta_evaluaciones, encoding='utf-8') as f:
+                self.evaluaciones = json.load(f)
+        else:
+            # Carteras anteriores guardaban las evaluaciones en el mismo archivo
+            self.evaluaciones = datos.get('evaluaciones', {})
+
+    def guardar(self):
+        """Guarda los contribuyentes (lo usa `cargar`; las rondas solo guardan evaluaciones)"""
+        _escribir_json(self.ruta, {'contribuyentes': self.contribuyentes})
+
+    def guardar_evaluaciones(self):
+        _escribir_json(self.ruta_evaluaciones, self.evaluaciones)
+
+    def actualizar_contribuyente(self, cuit, nombre, categoria, meses):
+        """
+        Alta o actualización de un contribuyente; los meses nuevos reemplazan a los
+        existentes. Si cambió la categoría o algún mes sube su versión.
+        """
+        contribuyente = self.contribuyentes.setdefault(
+            cuit, {'nombre': nombre, 'categoria': categoria, 'meses': {}, 'version': 0})
+        cambio = contribuyente['categoria'] != categoria or not contribuyente['meses'] or any(
+            contribuyente['meses'].get(mes) != importe for mes, importe in meses.items())
+        contribuyente['nombre'] = nombre
+        contribuyente['categoria'] = categoria
+        contribuyente['meses'].update(meses)
+        if cambio:
+            contribuyente['version'] = contribuyente.get('version', 0) + 1
+
+    def pendientes(self, categorias=CATEGORIAS):
+        """CUITs y versión de los contribuyentes modificados desde su última evaluación (todos si cambió la tabla)"""
+        tabla = huella_categorias(categorias)
+        pendientes = []
+        for cuit, contribuyente in self.contribuyentes.items():
+            evaluacion = self.evaluaciones.get(cuit, {})
+            version = contribuyente.get('version', 0)
+            if evaluacion.get('version') != version or evaluacion.get('categorias') != tabla:
+                pendientes.append((cuit, version))
+        return pendientes
+
+
+def evaluar_contribuyente(contribuyente, categorias=CATEGORIAS):
+    """Evalúa los umbrales de la Sección 6 sobre el período de la próxima recategorización"""
+    meses = sorted(contribuyente['meses'].items())
+    if not meses:
+        return None
+
+    año, mes = meses[-1][0].split('-')
+    ultimo_mes = date(int(año), int(mes), 1)
+    proxima_recategorizacion = obtener_proxima_recategorizacion(ultimo_mes)
+    inicio = obtener_inicio_periodo_recategorizacion(proxima_recategorizacion).strftime('%Y-%m')
+
+    facturacion_acumulada = sum(importe for mes_str, importe in meses if mes_str >= inicio)
+    limite_categoria = categorias[contribuyente['categoria']]
+    categoria_encuadre, _ = determinar_categoria_encuadre(facturacion_acumulada, categorias)
+
+    return {
+        'estado': determinar_estado_alerta(facturacion_acumulada, limite_categoria),
+        'facturacion_acumulada': facturacion_acumulada,
+        'limite_categoria': limite_categoria,
+        'porcentaje_utilizado': (facturacion_acumulada / limite_categoria) * 100,
+        'margen_disponible': calcular_margen_disponible(facturacion_acumulada, limite_categoria),
+        'exceso_facturacion': calcular_exceso_facturacion(facturacion_acumulada, limite_categoria),
+        'categoria_encuadre': categoria_encuadre,
+        'proxima_recategorizacion': proxima_recategorizacion.isoformat(),
+        'meses_restantes': calcular_meses_restantes(ultimo_mes, proxima_recategorizacion)
+    }
+
+def escribir_alerta(outbox, cuit, contribuyente, estado_anterior, evaluacion):
+    """Deja la alerta en el outbox como un archivo JSON independiente"""
+    os.makedirs(outbox, exist_ok=True)
+    ahora = datetime.now()
+    alerta = {
+        'fecha': ahora.isoformat(timespec='seconds'),
+        'cuit': cuit,
+        'nombre': contribuyente['nombre'],
+        'categoria': contribuyente['categoria'],
+        'estado_anterior': estado_anterior,
+        **evaluacion
+    }
+    ruta = os.path.join(outbox, f"{ahora.strftime('%Y%m%d%H%M%S%f')}_{cuit}_{evaluacion['estado']}.json")
+    _escribir_json(ruta, alerta)
+    return ruta
+
+def ejecutar_ronda(cartera, outbox, categorias=CATEGORIAS):
+    """Re-evalúa solo los contribuyentes modificados y escribe los cruces de umbral en el outbox"""
+    evaluados, alertas = 0, 0
+    tabla = huella_categorias(categorias)
+    for cuit, version in cartera.pendientes(categorias):
+        contribuyente = cartera.contribuyentes[cuit]
+        evaluacion = evaluar_contribuyente(contribuyente, categorias)
+        evaluados += 1
+        if evaluacion is None:
+            continue
+
+        estado_anterior = cartera.evaluaciones.get(cuit, {}).get('estado', 'favorable')
+        if SEVERIDAD[evaluacion['estado']] > SEVERIDAD[estado_anterior]:
+            escribir_alerta(outbox, cuit, contribuyente, estado_anterior, evaluacion)
+            alertas += 1
+
+        cartera.evaluaciones[cuit] = {
+            'version': version,
+            'categorias': tabla,
+            'estado': evaluacion['estado'],
+            'fecha': datetime.now().isoformat(timespec='seconds')
+        }
+
+    if evaluados:
+        cartera.guardar_evaluaciones()
+    return evaluados, alertas
+
+def programar(ruta_cartera, outbox, intervalo, una_vez=False):
+    """Ejecuta una ronda cada `intervalo` segundos, releyendo la cartera en cada ronda"""
+    while True:
+        inicio = time.perf_counter()
+        # Con MONOTRIBUTO_PERFIL=1 se guarda un perfil por ronda
+        with perfilar('alertas_ronda') as perfil:
+            evaluados, alertas = ejecutar_ronda(Cartera(ruta_cartera), outbox)
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} | evaluados: {evaluados} | alertas: {alertas} | "
+              f"{(time.perf_counter() - inicio) * 1000:.0f} ms")
+        informar(perfil)
+        if una_vez:
+            return
+        time.sleep(intervalo)
+
+def main():
+    parser = argparse.ArgumentParser(description="Alertas locales de recategorización de monotributo")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    cargar = subparsers.add_parser('cargar', help="Carga o actualiza la facturación de un contribuyente desde un CSV de ARCA")
+    cargar.add_argument('cartera')
+    cargar.add_argument('archivo')
+    cargar.add_argument('--cuit', required=True)
+    cargar.add_argument('--nombre', required=True)
+    cargar.add_argument('--categoria', required=True, choices=list(CATEGORIAS.keys()))
+
+    ejecutar = subparsers.add_parser('ejecutar', help="Evalúa periódicamente la cartera y escribe alertas en el outbox")
+    ejecutar.add_argument('cartera')
+    ejecutar.add_argument('--outbox', default='outbox')
+    ejecutar.add_argument('--intervalo', type=int, default=3600, help="Segundos entre rondas")
+    ejecutar.add_argument('--una-vez', action='store_true', help="Ejecutar una sola ronda y salir")
+
+    args = parser.parse_args()
+
+    if args.comando == 'cargar':
+        _, facturacion_mensual, *_ = procesar_comprobantes(leer_csv_arca(args.archivo))
+        cartera = Cartera(args.cartera)
+        cartera.actualizar_contribuyente(args.cuit, args.nombre, args.categoria,
+                                         meses_desde_facturacion_mensual(facturacion_mensual))
+        cartera.guardar()
+        print(f"✅ {args.nombre} ({args.cuit}): {len(facturacion_mensual)} meses cargados")
+    else:
+        programar(args.cartera, args.outbox, args.intervalo, args.una_vez)
+
+if __name__ == "__main__":
+    main()
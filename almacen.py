@@ -0,0 +1,396 @@
+"""
+Almacén local SQLite de comprobantes para varios contribuyentes.
+
+Guarda los comprobantes ya normalizados (notas de crédito con signo negativo)
+indexados por (CUIT, fecha) y mantiene una tabla materializada con la
+facturación mensual de cada cliente, que se actualiza en la misma transacción
+de cada inserción. Las vistas multi-cliente y las métricas de recategorización
+leen de esa tabla en lugar de volver a procesar los CSV.
+
+Además guarda un resumen precalculado por cliente (margen, % utilizado, exceso,
+meses restantes) que se actualiza junto con la facturación mensual. La página
+de cartera ordena, filtra y pagina sobre ese resumen en SQL, usando sus índices.
+
+    python almacen.py importar comprobantes.sqlite export.csv --cuit 20123456789 --nombre "Juan Pérez" --categoria B
+    python almacen.py registrar comprobantes.sqlite --cuit 20123456789 --nombre "Juan Pérez" --categoria B
+    python almacen.py resumir comprobantes.sqlite
+"""
+import argparse
+import sqlite3
+import time
+
+import pandas as pd
+
+from calculos import CATEGORIAS, calcular_resumen_recategorizacion
+from perfilado import informar, perfilar
+from procesamiento import (
+    calcular_meses_restantes,
+    leer_csv_arca,
+    normalizar_comprobantes,
+    obtener_inicio_periodo_recategorizacion,
+    obtener_proxima_recategorizacion
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS contribuyentes (
+    cuit TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    categoria TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS comprobantes (
+    cuit TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    mes TEXT NOT NULL,
+    tipo INTEGER NOT NULL,
+    punto_venta INTEGER NOT NULL,
+    numero_desde INTEGER NOT NULL,
+    numero_hasta INTEGER NOT NULL,
+    nro_doc_receptor TEXT,
+    denominacion_receptor TEXT,
+    imp_total REAL NOT NULL,
+    PRIMARY KEY (cuit, tipo, punto_venta, numero_desde)
+);
+
+CREATE INDEX IF NOT EXISTS idx_comprobantes_cuit_fecha ON comprobantes (cuit, fecha);
+
+CREATE TABLE IF NOT EXISTS facturacion_mensual (
+    cuit TEXT NOT NULL,
+    mes TEXT NOT NULL,
+    imp_total REAL NOT NULL,
+    cantidad INTEGER NOT NULL,
+    PRIMARY KEY (cuit, mes)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS archivos_ingeridos (
+    ruta TEXT PRIMARY KEY,
+    huella TEXT NOT NULL,
+    cuit TEXT NOT NULL,
+    comprobantes INTEGER NOT NULL,
+    ingerido_en TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archivos_ingeridos_huella ON archivos_ingeridos (huella);
+
+CREATE TABLE IF NOT EXISTS resumen_clientes (
+    cuit TEXT PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    ultimo_mes TEXT NOT NULL,
+    proxima_recategorizacion TEXT NOT NULL,
+    meses_restantes INTEGER NOT NULL,
+    facturacion_acumulada REAL NOT NULL,
+    limite_categoria REAL NOT NULL,
+    margen_disponible REAL NOT NULL,
+    porcentaje_utilizado REAL NOT NULL,
+    exceso INTEGER NOT NULL,
+    estado_alerta TEXT NOT NULL
+);
+
+-- Búsqueda por prefijo: LIKE no distingue mayúsculas y solo usa un índice NOCASE
+CREATE INDEX IF NOT EXISTS idx_resumen_nombre_busqueda ON resumen_clientes (nombre COLLATE NOCASE);
+
+-- Reemplazados por los índices de INDICES_CARTERA
+DROP INDEX IF EXISTS idx_resumen_porcentaje;
+DROP INDEX IF EXISTS idx_resumen_margen;
+DROP INDEX IF EXISTS idx_resumen_meses_restantes;
+DROP INDEX IF EXISTS idx_resumen_nombre;
+DROP INDEX IF EXISTS idx_resumen_exceso;
+DROP INDEX IF EXISTS idx_resumen_categoria;
+"""
+
+# Se guarda en PRAGMA user_version; al abrir una base anterior se completa resumen_clientes
+VERSION_ESQUEMA = 1
+
+# Columnas de resumen_clientes por las que se puede ordenar la cartera (todas indexadas)
+ORDENES_CARTERA = {
+    'porcentaje_utilizado': "% utilizado",
+    'margen_disponible': "Margen disponible",
+    'meses_restantes': "Meses restantes",
+    'nombre': "Nombre"
+}
+
+# Por cada orden, un índice (orden, cuit) y uno por filtro (filtro, orden, cuit): cualquier
+# combinación de filtro y orden se lee en el orden del índice, sin ordenar en memoria, y el
+# cuit desempata para la paginación por cursor de leer_resumenes
+INDICES_CARTERA = '\n'.join(
+    f"CREATE INDEX IF NOT EXISTS idx_cartera_{prefijo}{orden} ON resumen_clientes ({columnas}{orden}, cuit);"
+    for orden in ORDENES_CARTERA
+    for prefijo, columnas in (('', ''), ('categoria_', 'categoria, '), ('exceso_', 'exceso, '))
+)
+
+
+class Almacen:
+    """Conexión al almacén SQLite de comprobantes"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(ESQUEMA)
+        self.conexion.executescript(INDICES_CARTERA)
+        if self.conexion.execute("PRAGMA user_version").fetchone()[0] < VERSION_ESQUEMA:
+            # Base creada antes de existir resumen_clientes
+            self.recalcular_resumenes()
+            self.conexion.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def registrar_contribuyente(self, cuit, nombre, categoria):
+        with self.conexion:
+            self.conexion.execute(
+                "INSERT INTO contribuyentes (cuit, nombre, categoria) VALUES (?, ?, ?) "
+                "ON CONFLICT (cuit) DO UPDATE SET nombre = excluded.nombre, categoria = excluded.categoria",
+                (cuit, nombre, categoria)
+            )
+            self._actualizar_resumen(cuit)
+
+    def insertar_comprobantes(self, cuit, df):
+        """
+        Inserta comprobantes normalizados (salida de normalizar_comprobantes) de un contribuyente.
+
+        Un comprobante ya cargado (mismo tipo, punto de venta y número) se reemplaza.
+        La facturación mensual de los meses afectados se recalcula en la misma transacción.
+        """
+        if df.empty:
+            return 0
+
+        fechas = pd.to_datetime(df['Fecha de Emisión'])
+        filas = zip(
+            [cuit] * len(df),
+            fechas.dt.strftime('%Y-%m-%d').tolist(),
+            fechas.dt.strftime('%Y-%m').tolist(),
+            df['Tipo de Comprobante'].astype('int64').tolist(),
+            df['Punto de Venta'].astype('int64').tolist(),
+            df['Número Desde'].astype('int64').tolist(),
+            df['Número Hasta'].astype('int64').tolist(),
+            df['Nro. Doc. Receptor'].astype(str).tolist(),
+            df['Denominación Receptor'].astype(str).tolist(),
+            df['Imp. Total'].astype(float).tolist()
+        )
+        mes_desde = fechas.min().strftime('%Y-%m')
+        mes_hasta = fechas.max().strftime('%Y-%m')
+
+        with self.conexion:
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO comprobantes (cuit, fecha, mes, tipo, punto_venta, numero_desde, "
+                "numero_hasta, nro_doc_receptor, denominacion_receptor, imp_total) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                filas
+            )
+            self._recalcular_meses(cuit, mes_desde, mes_hasta)
+            self._actualizar_resumen(cuit)
+        return len(df)
+
+    def _recalcular_meses(self, cuit, mes_desde, mes_hasta):
+        """Recalcula la facturación mensual de un rango de meses usando el índice (cuit, fecha)"""
+        self.conexion.execute(
+            "DELETE FROM facturacion_mensual WHERE cuit = ? AND mes BETWEEN ? AND ?",
+            (cuit, mes_desde, mes_hasta)
+        )
+        self.conexion.execute(
+            "INSERT INTO facturacion_mensual (cuit, mes, imp_total, cantidad) "
+            "SELECT cuit, mes, SUM(imp_total), COUNT(*) FROM comprobantes "
+            "WHERE cuit = ? AND fecha BETWEEN ? AND ? GROUP BY cuit, mes",
+            (cuit, f"{mes_desde}-01", f"{mes_hasta}-31")
+        )
+
+    def huella_ingerida(self, huella):
+        """Indica si ya se ingirió un archivo con exactamente este contenido"""
+        return self.conexion.execute(
+            "SELECT 1 FROM archivos_ingeridos WHERE huella = ? LIMIT 1", (huella,)
+        ).fetchone() is not None
+
+    def registrar_archivo(self, ruta, huella, cuit, comprobantes):
+        with self.conexion:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO archivos_ingeridos (ruta, huella, cuit, comprobantes, ingerido_en) "
+                "VALUES (?, ?, ?, ?, datetime('now', 'localtime'))",
+                (ruta, huella, cuit, comprobantes)
+            )
+
+    def contribuyente_registrado(self, cuit):
+        return self.conexion.execute("SELECT 1 FROM contribuyentes WHERE cuit = ?", (cuit,)).fetchone() is not None
+
+    def leer_facturacion_mensual(self, cuit, mes_desde=None):
+        """Facturación mensual de un contribuyente con las mismas columnas que procesar_csv"""
+        consulta = "SELECT mes, imp_total FROM facturacion_mensual WHERE cuit = ?"
+        parametros = [cuit]
+        if mes_desde:
+            consulta += " AND mes >= ?"
+            parametros.append(mes_desde)
+        filas = self.conexion.execute(consulta + " ORDER BY mes", parametros).fetchall()
+
+        meses = pd.PeriodIndex([mes for mes, _ in filas], freq='M')
+        facturacion_mensual = pd.DataFrame({
+            'Mes': meses.to_timestamp(),
+            'Imp. Total': [importe for _, importe in filas]
+        })
+        facturacion_mensual['Mes_Period'] = meses
+        facturacion_mensual['Mes_Str'] = [mes for mes, _ in filas]
+        facturacion_mensual['Acumulado'] = facturacion_mensual['Imp. Total'].cumsum()
+        return facturacion_mensual
+
+    def ultimo_mes(self, cuit):
+        fila = self.conexion.execute("SELECT MAX(mes) FROM facturacion_mensual WHERE cuit = ?", (cuit,)).fetchone()
+        return fila[0]
+
+    def resumen_contribuyente(self, cuit, categorias=CATEGORIAS):
+        """Métricas de recategorización de un contribuyente leídas de la facturación mensual"""
+        fila = self.conexion.execute("SELECT categoria FROM contribuyentes WHERE cuit = ?", (cuit,)).fetchone()
+        ultimo_mes = self.ultimo_mes(cuit)
+        if fila is None or ultimo_mes is None:
+            return None
+
+        fecha_ultimo_mes = pd.Period(ultimo_mes, freq='M').to_timestamp().date()
+        proxima_recategorizacion = obtener_proxima_recategorizacion(fecha_ultimo_mes)
+        inicio = obtener_inicio_periodo_recategorizacion(proxima_recategorizacion)
+        facturacion_mensual = self.leer_facturacion_mensual(cuit, inicio.strftime('%Y-%m'))
+        meses_restantes = calcular_meses_restantes(fecha_ultimo_mes, proxima_recategorizacion)
+
+        resumen = calcular_resumen_recategorizacion(facturacion_mensual, fila[0], categorias, meses_restantes)
+        resumen['proxima_recategorizacion'] = proxima_recategorizacion
+        return resumen
+
+    def _actualizar_resumen(self, cuit, categorias=CATEGORIAS):
+        """Recalcula la fila de resumen_clientes de un contribuyente (sin transacción propia)"""
+        resumen = self.resumen_contribuyente(cuit, categorias)
+        if resumen is None:
+            # Sin categoría registrada o sin comprobantes: no aparece en la cartera
+            self.conexion.execute("DELETE FROM resumen_clientes WHERE cuit = ?", (cuit,))
+            return
+
+        nombre, categoria = self.conexion.execute(
+            "SELECT nombre, categoria FROM contribuyentes WHERE cuit = ?", (cuit,)
+        ).fetchone()
+        self.conexion.execute(
+            "INSERT OR REPLACE INTO resumen_clientes (cuit, nombre, categoria, ultimo_mes, proxima_recategorizacion, "
+            "meses_restantes, facturacion_acumulada, limite_categoria, margen_disponible, porcentaje_utilizado, "
+            "exceso, estado_alerta) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cuit, nombre, categoria, self.ultimo_mes(cuit), resumen['proxima_recategorizacion'].isoformat(),
+             int(resumen['meses_restantes']), float(resumen['facturacion_acumulada']),
+             float(resumen['limite_categoria']), float(resumen['margen_disponible']),
+             float(resumen['porcentaje_utilizado']), int(resumen['exceso_facturacion'] > 0),
+             resumen['estado_alerta'])
+        )
+
+    def recalcular_resumenes(self, categorias=CATEGORIAS):
+        """Recalcula el resumen de todos los contribuyentes (p. ej. al cambiar los límites de las categorías)"""
+        cuits = [fila[0] for fila in self.conexion.execute("SELECT cuit FROM contribuyentes")]
+        with self.conexion:
+            for cuit in cuits:
+                self._actualizar_resumen(cuit, categorias)
+        return len(cuits)
+
+    def leer_resumenes(self, orden='porcentaje_utilizado', descendente=True, busqueda=None,
+                       categoria=None, solo_exceso=False, limite=50, despues_de=None):
+        """
+        Una página de la cartera leída de resumen_clientes y la cantidad total de filas del filtro.
+
+        El orden y los filtros se resuelven en SQL recorriendo los índices de INDICES_CARTERA.
+        La paginación es por cursor: `despues_de` es el (valor del orden, cuit) de la última
+        fila de la página anterior (ver cursor_siguiente), así cada página arranca en el índice
+        sin saltear filas con OFFSET. La búsqueda es por prefijo del nombre o del CUIT. El total
+        del filtro es un COUNT que recorre las filas que cumplen el filtro (todas, sin filtros),
+        por lo que crece con la cantidad de clientes aunque sin volver a calcular nada.
+        """
+        if orden not in ORDENES_CARTERA:
+            raise ValueError(f"Orden no soportado: {orden}")
+
+        condiciones, parametros = [], []
+        if busqueda:
+            # Comodines de LIKE escapados: el texto se busca literal, como prefijo
+            prefijo = busqueda.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            if busqueda.isdigit():
+                condiciones.append("(nombre LIKE ? ESCAPE '\\' OR cuit GLOB ?)")
+                parametros += [f"{prefijo}%", f"{busqueda}*"]
+            else:
+                condiciones.append("nombre LIKE ? ESCAPE '\\'")
+                parametros.append(f"{prefijo}%")
+        if categoria:
+            condiciones.append("categoria = ?")
+            parametros.append(categoria)
+        if solo_exceso:
+            condiciones.append("exceso = 1")
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        total = self.conexion.execute(f"SELECT COUNT(*) FROM resumen_clientes{donde}", parametros).fetchone()[0]
+
+        # El cuit desempata en la misma dirección que el orden, así el índice se recorre sin reordenar
+        direccion = 'DESC' if descendente else 'ASC'
+        if despues_de is not None:
+            condiciones.append(f"({orden}, cuit) {'<' if descendente else '>'} (?, ?)")
+            parametros += list(despues_de)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        pagina = pd.read_sql_query(
+            f"SELECT cuit, nombre, categoria, ultimo_mes, proxima_recategorizacion, meses_restantes, "
+            f"facturacion_acumulada, limite_categoria, margen_disponible, porcentaje_utilizado, exceso, estado_alerta "
+            f"FROM resumen_clientes{donde} ORDER BY {orden} {direccion}, cuit {direccion} LIMIT ?",
+            self.conexion,
+            params=parametros + [limite]
+        )
+        pagina['exceso'] = pagina['exceso'].astype(bool)
+        return pagina, total
+
+
+def cursor_siguiente(pagina, orden):
+    """Cursor (valor del orden, cuit) de la última fila de una página, para pedir la siguiente"""
+    valor = pagina[orden].iloc[-1]
+    # sqlite3 no acepta escalares de numpy como parámetros
+    return (valor.item() if hasattr(valor, 'item') else valor), pagina['cuit'].iloc[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacén SQLite de comprobantes de ARCA")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    importar = subparsers.add_parser('importar', help="Importa el CSV de Mis Comprobantes de un contribuyente")
+    importar.add_argument('base')
+    importar.add_argument('archivo')
+    importar.add_argument('--cuit', required=True)
+    importar.add_argument('--nombre', required=True)
+    importar.add_argument('--categoria', required=True, choices=list(CATEGORIAS.keys()))
+
+    registrar = subparsers.add_parser('registrar', help="Da de alta o actualiza un contribuyente sin importar comprobantes")
+    registrar.add_argument('base')
+    registrar.add_argument('--cuit', required=True)
+    registrar.add_argument('--nombre', required=True)
+    registrar.add_argument('--categoria', required=True, choices=list(CATEGORIAS.keys()))
+
+    resumir = subparsers.add_parser('resumir', help="Recalcula el resumen por cliente que usa la página de cartera")
+    resumir.add_argument('base')
+
+    args = parser.parse_args()
+
+    if args.comando == 'resumir':
+        with Almacen(args.base) as almacen:
+            cantidad = almacen.recalcular_resumenes()
+        print(f"✅ Resumen recalculado para {cantidad} contribuyentes")
+        return
+
+    if args.comando == 'registrar':
+        with Almacen(args.base) as almacen:
+            almacen.registrar_contribuyente(args.cuit, args.nombre, args.categoria)
+        print(f"✅ {args.nombre} ({args.cuit}) registrado en categoría {args.categoria}")
+        return
+
+    inicio = time.perf_counter()
+    df = normalizar_comprobantes(leer_csv_arca(args.archivo))
+    with Almacen(args.base) as almacen:
+        almacen.registrar_contribuyente(args.cuit, args.nombre, args.categoria)
+        cantidad = almacen.insertar_comprobantes(args.cuit, df)
+    print(f"✅ {cantidad} comprobantes importados para {args.nombre} ({args.cuit}) "
+          f"en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    # MONOTRIBUTO_PERFIL=1 guarda un perfil de CPU y memoria de la ejecución
+    with perfilar('almacen') as perfil:
+        main()
+    informar(perfil)
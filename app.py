@@ -1,84 +1,134 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import io
+import os
+import time
+import uuid
 from datetime import datetime
 import streamlit_shadcn_ui as ui
 from local_components import card_container
-import locale
 from calculos import (
+    CATEGORIAS,
+    HORIZONTE_PROYECCION_DIAS,
     calcular_facturacion_total,
     calcular_facturacion_promedio_mensual,
     calcular_tasa_crecimiento_promedio_mensual,
-    calcular_margen_disponible,
-    calcular_exceso_facturacion,
-    calcular_promedio_mensual_disponible,
-    calcular_reduccion_necesaria,
-    determinar_categoria_encuadre,
-    analizar_categoria_siguiente
+    calcular_resumen_recategorizacion,
+    calcular_serie_diaria,
+    calcular_fechas_cruce,
+    proyectar_fechas_cruce,
+    meses_siguientes,
+    planificar_facturacion
+)
+from procesamiento import (
+    ColumnasFaltantesError,
+    COLUMNAS_REQUERIDAS,
+    configurar_locale,
+    construir_indice_receptores,
+    leer_csv_arca,
+    obtener_inicio_periodo_recategorizacion,
+    procesar_comprobantes,
+    resultado_vacio
+)
+from notas_credito import calcular_saldos_receptores, emparejar_notas_credito
+from perfilado import en_hilo_perfilado, perfil_solicitado, perfilar, seccion
+from reportes import construir_pdf_reporte, nombre_archivo_reporte
+from cache_arrow import abrir_dataset, abrir_receptores, clave_dataset, guardar_dataset
+from cola_trabajos import ColaLlenaError, obtener_cola
+from visualizacion import (
+    FILAS_POR_PAGINA,
+    PERIODOS_BARRAS,
+    agregar_para_barras,
+    frecuencia_barras,
+    paginar,
+    reducir_serie
 )
 
 # Establecer el idioma español para la conversión de fechas
-try:
-    # Attempt Windows locale setting
-    locale.setlocale(locale.LC_TIME, 'Spanish_Spain.1252')
-except locale.Error:
+configurar_locale()
+
+def resultado_vacio_app():
+    """Resultado vacío de procesar_csv: el de procesar_comprobantes más un índice de receptores vacío"""
+    return resultado_vacio() + (pd.Series(dtype=object, name='Receptor'),)
+
+def abrir_de_cache(clave):
+    """Dataset procesado e índice de receptores desde la caché Arrow, o None"""
+    resultado = abrir_dataset(clave)
+    receptores = abrir_receptores(clave)
+    if resultado is None or receptores is None:
+        return None
+    return resultado + (receptores,)
+
+def procesar_y_guardar(contenido, clave):
+    """Lee, procesa y guarda en la caché Arrow un CSV. Se ejecuta en la cola de trabajos."""
+    resultado = procesar_comprobantes(leer_csv_arca(io.BytesIO(contenido)))
+    # El índice de nombres canónicos se arma una sola vez por dataset y se guarda con él
+    receptores = construir_indice_receptores(resultado[0])
     try:
-        # Fallback to Linux locale setting
-        locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-    except locale.Error:
-        # Use system default if specified locales are unavailable
-        locale.setlocale(locale.LC_TIME, '')
-
-# Función para determinar la fecha de próxima recategorización
-def obtener_proxima_recategorizacion(fecha_actual):
-    """
-    Determina la próxima fecha de recategorización según el mes actual.
-    Recategorización SEMESTRAL en ARCA:
-    - ENERO: evalúa período Jul-Dic del año anterior
-    - JULIO: evalúa período Ene-Jun del año actual
-
-    Por lo tanto:
-    - Si estamos en Jul-Dic: próxima recategorización = Enero del año siguiente
-    - Si estamos en Ene-Jun: próxima recategorización = Julio del año actual
-    """
-    mes_actual = fecha_actual.month
-    año_actual = fecha_actual.year
-
-    if mes_actual >= 7:  # Julio a Diciembre
-        # Próxima recategorización: Enero del próximo año
-        return datetime(año_actual + 1, 1, 1).date()
-    else:  # Enero a Junio
-        # Próxima recategorización: Julio del año actual
-        return datetime(año_actual, 7, 1).date()
+        guardar_dataset(clave, resultado, receptores)
+    except OSError:
+        # Sin caché disponible (p. ej. disco de solo lectura): usar el resultado en memoria
+        return resultado + (receptores,)
+    return abrir_de_cache(clave) or resultado + (receptores,)
+
+def esperar_trabajo(trabajo):
+    """Muestra el estado del trabajo (en cola / procesando) hasta que termina y devuelve su resultado"""
+    cola = obtener_cola()
+    with st.status("⏳ Archivo en cola...") as estado:
+        while not trabajo.futuro.done():
+            if trabajo.estado == 'en_cola':
+                metricas = cola.metricas()
+                estado.update(label=f"⏳ Archivo en cola (posición {cola.posicion(trabajo) + 1}) · "
+                                    f"espera promedio {metricas['espera_media_s']:.0f} s")
+            else:
+                estado.update(label="⚙️ Procesando archivo...")
+            time.sleep(0.25)
+
+        if trabajo.futuro.exception() is not None:
+            estado.update(label="❌ Error al procesar el archivo", state="error")
+        else:
+            estado.update(label="✅ Archivo procesado", state="complete")
+    return trabajo.futuro.result()
 
 # Función de ETL mejorada para período móvil de recategorización
 def procesar_csv(uploaded_file):
     if uploaded_file is not None:
-        try:
-            df = pd.read_csv(uploaded_file, sep=';', encoding='utf-8', decimal=',', thousands='.')
-            df.columns = [col.strip() for col in df.columns]
-
-            columnas_requeridas = [
-                'Fecha de Emisión', 'Tipo de Comprobante', 'Punto de Venta',
-                'Número Desde', 'Número Hasta', 'Nro. Doc. Receptor', 'Denominación Receptor', 'Imp. Total']
+        contenido = uploaded_file.getvalue()
 
-            # Validar que las columnas requeridas existan
-            columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
-            if columnas_faltantes:
-                st.error(f"""
-                ❌ **Error en el archivo CSV**
+        # Si otra sesión ya procesó este mismo archivo, se comparte desde la caché Arrow
+        clave = clave_dataset(contenido)
+        resultado = abrir_de_cache(clave)
+        if resultado is not None:
+            return resultado
 
-                Faltan las siguientes columnas: **{', '.join(columnas_faltantes)}**
+        # El procesamiento pasa por la cola global para no frenar al resto de los usuarios.
+        # Con la clave, si una re-ejecución interrumpió la espera se retoma el mismo trabajo.
+        id_sesion = st.session_state.setdefault('id_sesion', uuid.uuid4().hex)
+        try:
+            trabajo = obtener_cola().enviar(id_sesion, len(contenido), en_hilo_perfilado(procesar_y_guardar),
+                                            contenido, clave, clave=clave)
+            return esperar_trabajo(trabajo)
+        except ColaLlenaError:
+            st.error("""
+            ⏳ **El servidor está procesando muchos archivos en este momento**
+
+            Volvé a intentar en unos minutos.
+            """)
+            return resultado_vacio_app()
+        except ColumnasFaltantesError as e:
+            st.error(f"""
+            ❌ **Error en el archivo CSV**
 
-                **Asegurate de descargar el archivo desde:**
-                1. ARCA → Mis Comprobantes → Emitidos
-                2. Formato: **CSV** con punto y coma (;) como separador
+            Faltan las siguientes columnas: **{', '.join(e.columnas_faltantes)}**
 
-                Columnas esperadas: {', '.join(columnas_requeridas)}
-                """)
-                return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None, None, None, 0
+            **Asegurate de descargar el archivo desde:**
+            1. ARCA → Mis Comprobantes → Emitidos
+            2. Formato: **CSV** con punto y coma (;) como separador
 
-            df = df[columnas_requeridas]
+            Columnas esperadas: {', '.join(COLUMNAS_REQUERIDAS)}
+            """)
+            return resultado_vacio_app()
         except Exception as e:
             st.error(f"""
             ❌ **Error al procesar el archivo CSV**
@@ -91,48 +141,19 @@ def procesar_csv(uploaded_file):
             - El formato sea UTF-8
             - Contenga todas las columnas requeridas
             """)
-            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None, None, None, 0
-        df['Nro. Doc. Receptor'] = df['Nro. Doc. Receptor'].astype(str)
-        df['Fecha de Emisión'] = pd.to_datetime(df['Fecha de Emisión'], format='%Y-%m-%d').dt.date
-        df['Imp. Total'] = df.apply(lambda row: -row['Imp. Total'] if row['Tipo de Comprobante'] == 13 else row['Imp. Total'], axis=1)
-        df['Mes'] = pd.to_datetime(df['Fecha de Emisión']).dt.to_period('M')
-
-        # Facturación mensual agrupada
-        facturacion_mensual = df.groupby('Mes')['Imp. Total'].sum().reset_index()
-        facturacion_mensual['Mes_Period'] = facturacion_mensual['Mes']  # Guardar Period
-        facturacion_mensual['Mes'] = facturacion_mensual['Mes'].dt.to_timestamp()
-        facturacion_mensual['Mes_Str'] = facturacion_mensual['Mes'].dt.strftime('%Y-%m')
-        facturacion_mensual['Acumulado'] = facturacion_mensual['Imp. Total'].cumsum()
-
-        # Determinar fecha de última factura cargada
-        fecha_max = df['Fecha de Emisión'].max()
-        fecha_min = df['Fecha de Emisión'].min()
-
-        # Calcular próxima recategorización
-        proxima_recategorizacion = obtener_proxima_recategorizacion(fecha_max)
-
-        # Calcular meses entre fecha_max y proxima_recategorizacion
-        # Restamos 1 porque no contamos el mes actual completo
-        meses_restantes = (proxima_recategorizacion.year - fecha_max.year) * 12 + \
-                         (proxima_recategorizacion.month - fecha_max.month) - 1
-        meses_restantes = max(0, meses_restantes)  # No puede ser negativo
-
-        # Para el análisis, separar en histórico y actual (opcional)
-        num_meses = len(facturacion_mensual)
-        if num_meses >= 6:
-            # Si hay 6 o más meses, separar en histórico (primeros) y actual (últimos)
-            mitad = num_meses // 2
-            facturacion_historica = facturacion_mensual.iloc[:mitad].copy()
-            facturacion_actual = facturacion_mensual.iloc[mitad:].copy()
-        else:
-            # Si hay menos de 6 meses, todo es período actual
-            facturacion_historica = pd.DataFrame()
-            facturacion_actual = facturacion_mensual.copy()
-
-        return df, facturacion_mensual, facturacion_historica, facturacion_actual, fecha_min, fecha_max, proxima_recategorizacion, meses_restantes
+            return resultado_vacio_app()
     else:
         # Devuelve DataFrames vacíos si no se subió ningún archivo
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None, None, None, 0
+        return resultado_vacio_app()
+
+def mostrar_tabla_paginada(df, clave, formato=None, filas_por_pagina=FILAS_POR_PAGINA, **kwargs):
+    """Muestra un DataFrame de a una página, así solo se envían al navegador las filas visibles"""
+    pagina = 1
+    if len(df) > filas_por_pagina:
+        paginas = -(-len(df) // filas_por_pagina)
+        pagina = st.number_input(f"Página (de {paginas}, {len(df)} filas)", min_value=1, max_value=paginas, value=1, key=clave)
+    filas, _ = paginar(df, pagina, filas_por_pagina)
+    st.dataframe(filas.style.format(formato) if formato else filas, hide_index=True, **kwargs)
 
 def calcular_kpis(facturacion_mensual):
     facturacion_total = calcular_facturacion_total(facturacion_mensual)
@@ -140,6 +161,23 @@ def calcular_kpis(facturacion_mensual):
     tasa_crecimiento_promedio = calcular_tasa_crecimiento_promedio_mensual(facturacion_mensual)
     return facturacion_total, facturacion_promedio_mensual, tasa_crecimiento_promedio
 
+def mostrar_descargas_perfil(perfil):
+    """Resumen y descarga de los archivos del perfil de esta ejecución (modo perfilado)"""
+    st.markdown("---")
+    st.subheader("🔎 Perfil de esta ejecución")
+    secciones = " | ".join(f"{nombre}: {segundos * 1000:.0f} ms" for nombre, segundos in perfil.secciones.items())
+    st.caption(f"Duración: {perfil.duracion * 1000:.0f} ms | Pico de memoria: "
+               f"{perfil.memoria['pico_bytes'] / 1024 ** 2:.1f} MB | {secciones or 'sin secciones medidas'}")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ Perfil de CPU (collapsed)", perfil.texto_collapsed(),
+                           file_name=os.path.basename(perfil.archivos['collapsed']), mime="text/plain",
+                           on_click="ignore")
+    with col2:
+        st.download_button("⬇️ Memoria y tiempos (JSON)", perfil.texto_resumen(),
+                           file_name=os.path.basename(perfil.archivos['resumen']), mime="application/json",
+                           on_click="ignore")
+
 def inject_ga():
     """Inyecta Google Analytics en la página (configurar GA_MEASUREMENT_ID cuando esté disponible)"""
     GA_MEASUREMENT_ID = "G-XXXXXXXXXX"  # Reemplazar con tu ID de Google Analytics
@@ -213,18 +251,15 @@ def main():
 
     with col2:
         # Montos vigentes desde abril 2026 (ARCA/ex-AFIP)
-        categorias = {
-            'A': 10277988.13, 'B': 15058447.71, 'C': 21113696.52, 'D': 26212853.42,
-            'E': 30833964.37, 'F': 38642048.36, 'G': 46288359.82, 'H': 70185003.97,
-            'I': 78570820.99, 'J': 89946653.09, 'K': 108357084.05
-        }
+        categorias = CATEGORIAS
         categoria_actual = st.selectbox("Selecciona tu categoría actual", options=list(categorias.keys()))
 
     with col3:
         uploaded_file = st.file_uploader("Sube tu archivo CSV del período anual (desde Julio o Enero)", type="csv")
 
     # Procesamos el CSV con período móvil de recategorización
-    df_completo, facturacion_mensual_completa, facturacion_historica, facturacion_actual, fecha_inicio_periodo, fecha_fin_periodo, fecha_recategorizacion, meses_faltantes = procesar_csv(uploaded_file)
+    with seccion('procesar_csv'):
+        df_completo, facturacion_mensual_completa, facturacion_historica, facturacion_actual, fecha_inicio_periodo, fecha_fin_periodo, fecha_recategorizacion, meses_faltantes, receptores = procesar_csv(uploaded_file)
 
     # Verificamos si el archivo CSV ha sido cargado
     if uploaded_file is not None:
@@ -233,16 +268,12 @@ def main():
         # Sección 4: Cálculo de Métricas y KPIs para Período de Recategorización
         # =============================================================================
 
-        # Obtenemos el límite de la categoría actual
-        limite_categoria_actual = categorias[categoria_actual]
+        # Métricas del período completo para la categoría actual
+        resumen = calcular_resumen_recategorizacion(facturacion_mensual_completa, categoria_actual, categorias, meses_faltantes)
 
-        # Cálculos del período completo (12 meses)
-        if not facturacion_mensual_completa.empty:
-            facturacion_total_12_meses = calcular_facturacion_total(facturacion_mensual_completa)
-            facturacion_acumulada_total = facturacion_mensual_completa['Acumulado'].iloc[-1]
-        else:
-            facturacion_total_12_meses = 0
-            facturacion_acumulada_total = 0
+        limite_categoria_actual = resumen['limite_categoria']
+        facturacion_total_12_meses = resumen['facturacion_total']
+        facturacion_acumulada_total = resumen['facturacion_acumulada']
 
         # Cálculos del período histórico (primeros 6 meses)
         if not facturacion_historica.empty:
@@ -261,26 +292,22 @@ def main():
             meses_transcurridos = 0
 
         # Total de meses cargados
-        meses_cargados = len(facturacion_mensual_completa) if not facturacion_mensual_completa.empty else 0
+        meses_cargados = resumen['meses_cargados']
 
         # Usar los meses restantes calculados por la función (hasta próxima recategorización)
-        meses_restantes = max(0, meses_faltantes)
+        meses_restantes = resumen['meses_restantes']
 
-        # Calcular margen disponible y exceso
-        margen_disponible = calcular_margen_disponible(facturacion_acumulada_total, limite_categoria_actual)
-        exceso_facturacion = calcular_exceso_facturacion(facturacion_acumulada_total, limite_categoria_actual)
+        # Margen disponible, exceso, promedio disponible y reducción necesaria
+        margen_disponible = resumen['margen_disponible']
+        exceso_facturacion = resumen['exceso_facturacion']
+        promedio_mensual_disponible = resumen['promedio_mensual_disponible']
+        reduccion_mensual_necesaria = resumen['reduccion_mensual_necesaria']
+        porcentaje_utilizado = resumen['porcentaje_utilizado']
+        estado_alerta = resumen['estado_alerta']
 
-        # Promedio mensual disponible para los meses restantes
-        promedio_mensual_disponible = calcular_promedio_mensual_disponible(margen_disponible, meses_restantes) if meses_restantes > 0 else 0
-
-        # Si hay exceso, calcular reducción necesaria
-        reduccion_mensual_necesaria = calcular_reduccion_necesaria(exceso_facturacion, meses_restantes) if meses_restantes > 0 else 0
-
-        # Determinar categoría de encuadre si excede
-        categoria_encuadre, limite_encuadre = determinar_categoria_encuadre(facturacion_acumulada_total, categorias)
-
-        # Analizar categoría siguiente
-        analisis_siguiente = analizar_categoria_siguiente(facturacion_acumulada_total, categoria_actual, categorias, meses_restantes)
+        # Categoría de encuadre si excede y análisis de la categoría siguiente
+        categoria_encuadre = resumen['categoria_encuadre']
+        analisis_siguiente = resumen['analisis_siguiente']
 
 
         # =============================================================================
@@ -358,7 +385,7 @@ def main():
         st.markdown("---")
 
         # Alerta si hay exceso de facturación
-        if exceso_facturacion > 0:
+        if estado_alerta == 'exceso':
             st.error(f"""
             ### ⚠️ ALERTA: Exceso de Facturación Detectado
 
@@ -375,9 +402,7 @@ def main():
                 st.warning(f"⚠️ El período de recategorización está completo. En {fecha_recategorizacion.strftime('%B %Y')} quedará encuadrado en categoría **{categoria_encuadre}**.")
         else:
             # Alerta de proximidad al límite (si está al 80% o más)
-            porcentaje_utilizado = (facturacion_acumulada_total / limite_categoria_actual) * 100
-
-            if porcentaje_utilizado >= 80:
+            if estado_alerta == 'proximidad':
                 st.warning(f"""
                 ### ⚠️ Proximidad al Límite de Categoría
 
@@ -419,7 +444,7 @@ def main():
             bar_height = 0.3
 
             # Determinar color según estado
-            color_barra = 'red' if exceso_facturacion > 0 else ('orange' if porcentaje_utilizado >= 80 else 'green')
+            color_barra = {'exceso': 'red', 'proximidad': 'orange', 'favorable': 'green'}[estado_alerta]
 
             fig_acumulado = px.bar(
                 x=[facturacion_acumulada_total],
@@ -465,6 +490,43 @@ def main():
 
             st.plotly_chart(fig_acumulado, use_container_width=True)
 
+            # Fechas de cruce de límites sobre la serie diaria
+            with st.expander("📅 Fechas de Cruce de Límites"):
+                serie_diaria = calcular_serie_diaria(df_completo)
+                fechas_cruce, ritmo_diario = proyectar_fechas_cruce(serie_diaria, categorias)
+                fechas_reales = calcular_fechas_cruce(serie_diaria, categorias)
+
+                df_cruces = pd.DataFrame({
+                    'Categoría': list(categorias.keys()),
+                    'Límite': list(categorias.values()),
+                    'Fecha de Cruce': [
+                        (fechas_cruce[cat].strftime('%d/%m/%Y') + ('' if fechas_reales[cat] else ' (proyectada)'))
+                        if fechas_cruce[cat] else '-'
+                        for cat in categorias
+                    ]
+                })
+                st.dataframe(df_cruces.style.format({'Límite': '${:,.2f}'}), hide_index=True)
+
+                # Acumulado diario reducido con LTTB: el gráfico pesa lo mismo con meses o años de historia
+                fig_diario = px.line(
+                    reducir_serie(serie_diaria, 'Fecha', 'Acumulado'),
+                    x='Fecha',
+                    y='Acumulado',
+                    labels={'Acumulado': 'Facturación Acumulada (ARS)', 'Fecha': ''},
+                    height=350
+                )
+                fig_diario.add_hline(
+                    y=limite_categoria_actual,
+                    line_dash="dash",
+                    line_color="red",
+                    annotation_text=f"Límite Cat. {categoria_actual}",
+                    annotation_position="top left"
+                )
+                st.plotly_chart(fig_diario, use_container_width=True)
+                st.caption(f"Proyección según el ritmo diario promedio de los últimos 90 días: ${ritmo_diario:,.2f}/día. "
+                           f"Las fechas posteriores a {fecha_recategorizacion.strftime('%d/%m/%Y')} no afectan la próxima recategorización. "
+                           f"'-': a ese ritmo el límite no se alcanza en los próximos {HORIZONTE_PROYECCION_DIAS} días.")
+
         # =============================================================================
         # Sección 8: Gráfico de Facturación Mensual
         # =============================================================================
@@ -481,13 +543,16 @@ def main():
                     # Formato del período para el título
                     periodo_titulo = f"{fecha_inicio_periodo.strftime('%b %Y')} - {fecha_fin_periodo.strftime('%b %Y')}"
 
-                    # Crear el gráfico usando Mes_Str para el eje X
+                    # Crear el gráfico usando Mes_Str para el eje X (agrupado si hay demasiados meses)
+                    frecuencia = frecuencia_barras(facturacion_mensual_completa)
+                    titulo_barras = {'M': 'Facturación Mensual', 'Q': 'Facturación Trimestral',
+                                     'Y': 'Facturación Anual'}[frecuencia]
                     fig_mensual = px.bar(
-                        facturacion_mensual_completa,
+                        agregar_para_barras(facturacion_mensual_completa),
                         x='Mes_Str',
                         y='Imp. Total',
-                        title=f'Facturación Mensual - {contribuyente} ({periodo_titulo})',
-                        labels={'Imp. Total': 'Facturación Mensual (ARS)', 'Mes_Str': 'Mes'},
+                        title=f'{titulo_barras} - {contribuyente} ({periodo_titulo})',
+                        labels={'Imp. Total': f'{titulo_barras} (ARS)', 'Mes_Str': PERIODOS_BARRAS[frecuencia]},
                         color='Imp. Total',
                         color_continuous_scale='Blues'
                     )
@@ -503,9 +568,11 @@ def main():
             with col2:
                 st.write("**Facturación mensual:**")
                 # Mostrar solo las columnas relevantes
-                st.dataframe(
-                    facturacion_mensual_completa[['Mes_Str', 'Imp. Total']].rename(columns={'Mes_Str': 'Mes'}).style.format({'Imp. Total': '${:,.2f}'}),
-                    hide_index=True,
+                mostrar_tabla_paginada(
+                    facturacion_mensual_completa[['Mes_Str', 'Imp. Total']].rename(columns={'Mes_Str': 'Mes'}),
+                    clave="pagina_mensual",
+                    formato={'Imp. Total': '${:,.2f}'},
+                    filas_por_pagina=12,
                     height=350
                 )
             
@@ -517,28 +584,34 @@ def main():
         st.markdown("---")
         st.subheader("📊 Facturación por Cliente")
 
-        # Cantidad de clientes
-        num_receptores_unicos = df_completo['Denominación Receptor'].nunique()
+        # Cantidad de clientes (identificados por documento, no por denominación)
+        num_receptores_unicos = df_completo['ID Receptor'].nunique()
         st.write(f"Número de clientes únicos en el período: **{num_receptores_unicos}**")
 
         col1, col2 = st.columns([1, 1.5])
 
         with col1:
-            # Agrupación por cliente y recuento de facturas
-            facturacion_cliente = df_completo.groupby('Denominación Receptor')['Imp. Total'].sum().reset_index()
-            cantidad_facturas = df_completo.groupby('Denominación Receptor').size().reset_index(name='Cantidad de Facturas')
-            facturacion_cliente = pd.merge(facturacion_cliente, cantidad_facturas, on='Denominación Receptor')
+            # Agrupación por cliente (clave entera) y recuento de facturas
+            with seccion('facturacion_por_cliente'):
+                importes_cliente = df_completo.groupby('ID Receptor')['Imp. Total']
+                facturacion_cliente = pd.DataFrame({
+                    'Imp. Total': importes_cliente.sum(),
+                    'Cantidad de Facturas': importes_cliente.size()
+                })
+                facturacion_cliente.insert(0, 'Denominación Receptor', receptores.reindex(facturacion_cliente.index.astype('int64')).to_numpy())
+                facturacion_cliente = facturacion_cliente.reset_index(drop=True)
 
             # Crear la columna "Promedio por Factura"
             facturacion_cliente["Promedio por Factura"] = (facturacion_cliente["Imp. Total"] / facturacion_cliente["Cantidad de Facturas"]).round(2)
 
             # Mostrar la facturación por cliente con formato
-            st.dataframe(
-                facturacion_cliente.style.format({
+            mostrar_tabla_paginada(
+                facturacion_cliente,
+                clave="pagina_clientes",
+                formato={
                     'Imp. Total': '${:,.2f}',
                     'Promedio por Factura': '${:,.2f}'
-                }),
-                hide_index=True
+                }
             )
 
         with col2:
@@ -579,23 +652,24 @@ def main():
         # =============================================================================
         with st.expander("ℹ️ Detalle de Facturas por Cliente"):
 
-            # Crear una lista de clientes únicos para el selectbox
-            clientes_unicos = df_completo['Denominación Receptor'].unique().tolist()
-            clientes_unicos.sort()  # Ordenar alfabéticamente
+            # Crear una lista de clientes únicos para el selectbox (ordenada alfabéticamente por nombre canónico)
+            clientes_unicos = receptores.sort_values().index.tolist()
 
             # Agregar un selectbox para seleccionar el cliente
-            cliente_seleccionado = st.selectbox(
+            id_cliente_seleccionado = st.selectbox(
                 "Selecciona un cliente para ver sus facturas:",
                 options=clientes_unicos,
+                format_func=lambda id_receptor: receptores[id_receptor],
                 index=0  # Selecciona el primer cliente por defecto
             )
+            cliente_seleccionado = receptores[id_cliente_seleccionado]
 
             # Filtrar el DataFrame por el cliente seleccionado
-            facturas_cliente = df_completo[df_completo['Denominación Receptor'] == cliente_seleccionado]
+            facturas_cliente = df_completo[df_completo['ID Receptor'] == id_cliente_seleccionado]
 
             # Mostrar el DataFrame filtrado
             st.write(f"Facturas del cliente: **{cliente_seleccionado}**")
-            st.dataframe(facturas_cliente)
+            mostrar_tabla_paginada(facturas_cliente, clave="pagina_facturas_cliente")
 
             # Opcional: Mostrar un resumen de las facturas del cliente
             st.write(f"**Resumen de Facturas para {cliente_seleccionado}:**")
@@ -613,9 +687,34 @@ def main():
         with st.expander("ℹ️ Detalle Notas de Crédito C"):
             st.write("Notas de Crédito C (tipo '13'):")
             if not notas_de_credito.empty:
-                st.dataframe(notas_de_credito)
+                mostrar_tabla_paginada(notas_de_credito, clave="pagina_notas_credito")
                 total_notas_de_credito = notas_de_credito['Imp. Total'].sum()
                 st.write(f"Total notas de crédito: **${total_notas_de_credito:,.2f}**")
+
+                # Factura que anula cada nota: mismo receptor e importe, emitida antes
+                emparejamientos = emparejar_notas_credito(df_completo)
+                emparejamientos.insert(4, 'Receptor', emparejamientos['ID Receptor'].map(receptores))
+                vinculadas = emparejamientos['Factura Número'].notna().sum()
+                st.write(f"**Factura anulada por cada nota:** {vinculadas} de {len(emparejamientos)} notas "
+                         f"vinculadas con una factura del mismo cliente e importe")
+                mostrar_tabla_paginada(
+                    emparejamientos.drop(columns=['ID Receptor']),
+                    clave="pagina_emparejamientos",
+                    formato={'Imp. Total': '${:,.2f}'}
+                )
+
+                # Clientes con más notas de crédito que facturas en el período
+                saldos = calcular_saldos_receptores(df_completo)
+                saldos_negativos = saldos[saldos['Saldo Neto'] < 0]
+                if not saldos_negativos.empty:
+                    saldos_negativos = saldos_negativos.assign(Receptor=saldos_negativos['ID Receptor'].map(receptores))
+                    st.warning(f"⚠️ {len(saldos_negativos)} clientes tienen saldo neto negativo en el período:")
+                    st.dataframe(
+                        saldos_negativos[['Receptor', 'Facturado', 'Notas de Crédito', 'Saldo Neto']]
+                        .sort_values('Saldo Neto')
+                        .style.format({'Facturado': '${:,.2f}', 'Notas de Crédito': '${:,.2f}', 'Saldo Neto': '${:,.2f}'}),
+                        hide_index=True
+                    )
             else:
                 st.info("No hay notas de crédito en este período.")
 
@@ -667,9 +766,14 @@ def main():
         st.subheader("📊 Análisis Visual: Facturación Mensual y Proyección")
 
         with st.container(border=True):
-            # Crear DataFrame para el gráfico
-            df_grafico = facturacion_mensual_completa[['Mes_Str', 'Imp. Total']].copy()
+            # Siempre mensual y solo los meses que evalúa la próxima recategorización, para que
+            # las barras reales sean comparables con la proyección y el promedio mensual disponible
+            inicio_ventana = pd.Timestamp(obtener_inicio_periodo_recategorizacion(fecha_recategorizacion))
+            df_grafico = facturacion_mensual_completa.loc[
+                facturacion_mensual_completa['Mes'] >= inicio_ventana, ['Mes_Str', 'Imp. Total']
+            ].copy()
             df_grafico['Tipo'] = 'Facturación Real'
+            meses_grafico = len(df_grafico)
 
             # Si hay margen disponible y meses restantes, mostrar proyección
             if meses_restantes > 0 and promedio_mensual_disponible > 0:
@@ -740,13 +844,52 @@ def main():
             if meses_restantes > 0:
                 st.info(f"""
                 📊 **Interpretación del gráfico:**
-                - **Barras azules**: Facturación real de los meses cargados ({meses_cargados} meses)
+                - **Barras azules**: Facturación real de los meses que evalúa la recategorización ({meses_grafico} meses desde {inicio_ventana.strftime('%m/%Y')})
                 - **Barras naranjas**: Proyección del promedio mensual disponible para los próximos {meses_restantes} meses
                 - **Línea roja punteada**: Límite promedio que puedes facturar por mes sin exceder tu categoría
 
                 💡 Si las barras naranjas están por debajo o al nivel de la línea roja, estás dentro del margen seguro.
                 """)
 
+        # Planificador: compromisos conocidos por mes y margen de todas las categorías a la vez
+        if meses_restantes > 0:
+            with st.expander("🗓️ Planificador por categoría", expanded=False):
+                st.caption("Cargá la facturación ya comprometida en cada mes restante. La tabla muestra, para cada categoría, "
+                           "el margen que queda al final del período, ese margen repartido en partes iguales por mes "
+                           "y el margen que va quedando al cierre de cada mes con los compromisos cargados "
+                           "(en negativo, el mes en que se supera el límite).")
+
+                meses_plan = meses_siguientes(fecha_fin_periodo, meses_restantes)
+                compromisos = st.data_editor(
+                    pd.DataFrame({'Mes': meses_plan, 'Comprometido': [0.0] * len(meses_plan)}),
+                    key=f"compromisos_{fecha_fin_periodo}_{meses_restantes}",
+                    hide_index=True,
+                    disabled=['Mes'],
+                    column_config={'Comprometido': st.column_config.NumberColumn(min_value=0.0, format="$%.2f")}
+                )
+
+                plan = planificar_facturacion(
+                    facturacion_acumulada_total,
+                    compromisos.set_index('Mes')['Comprometido'],
+                    categorias
+                )
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("Facturación proyectada al recategorizar", f"${plan['facturacion_proyectada']:,.2f}")
+                with col2:
+                    if plan['categoria_minima'] is not None:
+                        st.metric("Categoría mínima para lo planificado", plan['categoria_minima'],
+                                  f"Límite ${plan['limite_minimo']:,.2f}", delta_color="off")
+                    else:
+                        st.metric("Categoría mínima para lo planificado", "Excede K")
+
+                tabla_plan = plan['holgura'].copy()
+                tabla_plan.insert(0, 'Promedio mensual', plan['promedio_mensual'])
+                tabla_plan.insert(0, 'Margen total', plan['margen_total'])
+                tabla_plan.index.name = 'Categoría'
+                st.dataframe(tabla_plan.style.format('${:,.2f}'), use_container_width=True)
+
         # =============================================================================
         # Sección 14: Exportar Reporte a PDF
         # =============================================================================
@@ -761,74 +904,17 @@ def main():
         with col2:
             if st.button("📥 Descargar PDF", type="primary", use_container_width=True):
                 # Generar PDF
-                from fpdf import FPDF, XPos, YPos
-                from datetime import datetime as dt
-
-                # Crear PDF
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_auto_page_break(auto=True, margin=15)
-
-                # Título
-                pdf.set_font('Helvetica', 'B', 20)
-                pdf.cell(0, 10, 'Reporte de Analisis de Monotributo', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-                pdf.ln(5)
-
-                # Información del contribuyente
-                pdf.set_font('Helvetica', 'B', 14)
-                pdf.cell(0, 10, f'Contribuyente: {contribuyente}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.set_font('Helvetica', '', 12)
-                pdf.cell(0, 8, f'Categoria Actual: {categoria_actual}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.cell(0, 8, f'Fecha de generacion: {dt.now().strftime("%d/%m/%Y %H:%M")}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.ln(5)
-
-                # Período analizado
-                pdf.set_font('Helvetica', 'B', 14)
-                pdf.cell(0, 10, 'Periodo Analizado', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.set_font('Helvetica', '', 11)
-                pdf.cell(0, 7, f'Desde: {fecha_inicio_periodo.strftime("%d/%m/%Y")}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.cell(0, 7, f'Hasta: {fecha_fin_periodo.strftime("%d/%m/%Y")}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.cell(0, 7, f'Meses cargados: {meses_cargados}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.cell(0, 7, f'Proxima recategorizacion: {fecha_recategorizacion.strftime("%B %Y")}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.cell(0, 7, f'Meses restantes: {meses_restantes}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.ln(5)
-
-                # Métricas principales
-                pdf.set_font('Helvetica', 'B', 14)
-                pdf.cell(0, 10, 'Metricas Principales', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.set_font('Helvetica', '', 11)
-                pdf.cell(0, 7, f'Limite de categoria {categoria_actual}: ${limite_categoria_actual:,.2f}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.cell(0, 7, f'Facturacion total acumulada: ${facturacion_total_12_meses:,.2f}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.cell(0, 7, f'Margen disponible: ${margen_disponible:,.2f}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-                if meses_restantes > 0:
-                    pdf.cell(0, 7, f'Promedio mensual disponible: ${promedio_mensual_disponible:,.2f}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-                if exceso_facturacion > 0:
-                    pdf.set_text_color(255, 0, 0)
-                    pdf.cell(0, 7, f'EXCESO de facturacion: ${exceso_facturacion:,.2f}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                    if categoria_encuadre:
-                        pdf.cell(0, 7, f'Nueva categoria de encuadre: {categoria_encuadre}', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                    pdf.set_text_color(0, 0, 0)
-
-                pdf.ln(5)
-
-                # Facturación mensual
-                pdf.set_font('Helvetica', 'B', 14)
-                pdf.cell(0, 10, 'Facturacion Mensual', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-                pdf.set_font('Helvetica', '', 10)
-
-                for idx, row in facturacion_mensual_completa.iterrows():
-                    pdf.cell(0, 6, f"{row['Mes_Str']}: ${row['Imp. Total']:,.2f}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-                # Generar archivo (convertir bytearray a bytes para Streamlit)
-                pdf_output = bytes(pdf.output())
+                with seccion('pdf'):
+                    pdf_output = construir_pdf_reporte(
+                        contribuyente, categoria_actual, resumen, facturacion_mensual_completa,
+                        fecha_inicio_periodo, fecha_fin_periodo, fecha_recategorizacion
+                    )
 
                 # Botón de descarga
                 st.download_button(
                     label="💾 Guardar PDF",
                     data=pdf_output,
-                    file_name=f"reporte_monotributo_{contribuyente.replace(' ', '_')}_{dt.now().strftime('%Y%m%d')}.pdf",
+                    file_name=nombre_archivo_reporte(contribuyente),
                     mime="application/pdf"
                 )
 
@@ -879,6 +965,8 @@ def main():
     st.markdown("---")
 
     with st.expander("💼 ¿Sos contador o manejás múltiples clientes monotributistas?"):
+        st.page_link("pages/1_📁_Cartera.py", label="Ver la cartera de clientes del almacén local", icon="📁")
+
         st.markdown("""
         ### Versión Enterprise para Estudios Contables
 
@@ -947,4 +1035,9 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    # Apagado, perfilar devuelve un nullcontext y perfil queda en None.
+    # ?perfil=1 solo se respeta si el servidor define MONOTRIBUTO_PERFIL_URL=1
+    with perfilar('app', perfil_solicitado(st.query_params.get('perfil'))) as perfil:
+        main()
+    if perfil is not None:
+        mostrar_descargas_perfil(perfil)
@@ -0,0 +1,51 @@
+"""
+Benchmark de lectura del CSV de ARCA: pandas vs pyarrow.
+
+    python benchmarks/bench_lectura_csv.py --filas 100000 500000 2000000
+
+Para cada tamaño genera un export sintético, lo lee con ambos motores,
+verifica que el frame normalizado sea el mismo e informa tiempos y aceleración.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos_sinteticos import generar_export_arca
+from procesamiento import leer_csv_arca, normalizar_comprobantes
+
+
+def medir(contenido, motor, repeticiones):
+    """Mejor tiempo de lectura + normalización entre varias repeticiones"""
+    mejor, df = None, None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = normalizar_comprobantes(leer_csv_arca(io.BytesIO(contenido), motor=motor))
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, df
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los motores de lectura del CSV de ARCA")
+    parser.add_argument('--filas', type=int, nargs='+', default=[100000, 500000, 2000000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'filas':>10} | {'MB':>7} | {'pandas (s)':>10} | {'pyarrow (s)':>11} | {'aceleración':>11}")
+    for filas in args.filas:
+        contenido = generar_export_arca(filas, semilla=filas)
+        tiempo_pandas, df_pandas = medir(contenido, 'pandas', args.repeticiones)
+        tiempo_pyarrow, df_pyarrow = medir(contenido, 'pyarrow', args.repeticiones)
+
+        pd.testing.assert_frame_equal(df_pandas, df_pyarrow, check_dtype=False)
+
+        print(f"{filas:>10} | {len(contenido) / 1e6:>7.1f} | {tiempo_pandas:>10.3f} | "
+              f"{tiempo_pyarrow:>11.3f} | {tiempo_pandas / tiempo_pyarrow:>10.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Prueba de carga del servicio HTTP de análisis (servicio.py).
+
+    python servicio.py --procesos 4 &
+    python benchmarks/carga_servicio.py --solicitudes 200 --concurrencia 16 --filas 20000
+
+Envía exports sintéticos a POST /analisis con la concurrencia indicada e
+informa solicitudes por segundo, latencias y respuestas 503 (rechazadas por
+el control de admisión del servicio).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import pandas as pd
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos_sinteticos import generar_export_arca
+
+
+async def enviar(cliente, url, contenido, latencias, estados):
+    inicio = time.perf_counter()
+    try:
+        respuesta = await cliente.fetch(url, method='POST', body=contenido, request_timeout=600,
+                                        headers={'Content-Type': 'text/csv'})
+        estados.append(respuesta.code)
+    except HTTPClientError as e:
+        estados.append(e.code)
+    latencias.append(time.perf_counter() - inicio)
+
+async def ejecutar(url, exports, solicitudes, concurrencia):
+    cliente = AsyncHTTPClient(max_clients=concurrencia)
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias, estados = [], []
+
+    async def una_solicitud(i):
+        async with semaforo:
+            await enviar(cliente, url, exports[i % len(exports)], latencias, estados)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una_solicitud(i) for i in range(solicitudes)))
+    return time.perf_counter() - inicio, latencias, estados
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de análisis")
+    parser.add_argument('--url', default='http://localhost:8888/analisis?categoria=D')
+    parser.add_argument('--solicitudes', type=int, default=200)
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--filas', type=int, default=20000, help="Comprobantes por export sintético")
+    parser.add_argument('--variantes', type=int, default=8, help="Cantidad de exports distintos a rotar")
+    args = parser.parse_args()
+
+    exports = [generar_export_arca(args.filas, semilla=i) for i in range(args.variantes)]
+    total, latencias, estados = asyncio.run(ejecutar(args.url, exports, args.solicitudes, args.concurrencia))
+
+    serie = pd.Series(latencias)
+    codigos = pd.Series(estados).value_counts().sort_index()
+    print(f"Solicitudes: {args.solicitudes} | concurrencia: {args.concurrencia} | "
+          f"export: {len(exports[0]) / 1e6:.1f} MB")
+    print(f"Total: {total:.2f} s | {args.solicitudes / total:.1f} solicitudes/s")
+    print(f"Latencia: p50 {serie.quantile(0.5) * 1000:.0f} ms | p95 {serie.quantile(0.95) * 1000:.0f} ms | "
+          f"máx {serie.max() * 1000:.0f} ms")
+    print("Códigos HTTP: " + ", ".join(f"{codigo}: {cantidad}" for codigo, cantidad in codigos.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Caché compartida de datasets procesados en archivos Arrow IPC.
+
+Cada CSV se procesa una sola vez: el resultado de procesar_comprobantes se
+guarda en archivos Arrow IPC sin compresión, identificados por el hash del
+contenido. Todas las sesiones de Streamlit (y otros procesos) los abren con
+memory-map de solo lectura y los convierten en DataFrames respaldados por
+Arrow sin copiar los datos, por lo que varias personas viendo el mismo
+cliente comparten las mismas páginas de memoria del sistema operativo.
+
+La caché tiene un tope de tamaño (MONOTRIBUTO_CACHE_MAX_MB): al guardar un
+dataset se borran los usados hace más tiempo hasta quedar por debajo del tope.
+Abrir un dataset actualiza la fecha de modificación de su archivo mensual, que
+es la que marca el último uso (la de acceso no es confiable con noatime).
+
+Los archivos contienen CUITs, nombres e importes de los clientes: el directorio
+se crea con permisos 0700 y los archivos con 0600, y no se usa un directorio
+que pertenezca a otro usuario (en ese caso no hay caché y se procesa en memoria).
+"""
+import hashlib
+import os
+import tempfile
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+
+from procesamiento import dividir_periodo
+
+# Cambiar si cambia la normalización o el formato de los archivos (invalida la caché)
+VERSION_FORMATO = 2
+
+# Por defecto, un directorio por usuario dentro del temporal del sistema
+_SUFIJO_USUARIO = f"_{os.getuid()}" if hasattr(os, 'getuid') else ''
+DIRECTORIO_CACHE = os.environ.get('MONOTRIBUTO_CACHE',
+                                  os.path.join(tempfile.gettempdir(), f'monotributo_cache{_SUFIJO_USUARIO}'))
+# Tamaño máximo de la caché; al superarlo se borran los datasets usados hace más tiempo
+MAX_BYTES_CACHE = int(os.environ.get('MONOTRIBUTO_CACHE_MAX_MB', '2048')) * 1024 * 1024
+
+
+def clave_dataset(contenido):
+    """Clave de caché de un CSV: hash de su contenido y de la versión del formato"""
+    return hashlib.sha256(f"v{VERSION_FORMATO}:".encode() + contenido).hexdigest()
+
+def _directorio_privado(directorio):
+    """
+    Crea el directorio de la caché con permisos 0700 y verifica que sea del usuario
+    actual; si pertenece a otro usuario levanta PermissionError.
+    """
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return
+    estado = os.stat(directorio)
+    if estado.st_uid != os.getuid():
+        raise PermissionError(f"El directorio de caché {directorio} pertenece a otro usuario")
+    if estado.st_mode & 0o077:
+        os.chmod(directorio, 0o700)
+
+def _es_privado(directorio):
+    """True si el directorio existe y es del usuario actual (siempre True donde no hay uid)"""
+    try:
+        return not hasattr(os, 'getuid') or os.stat(directorio).st_uid == os.getuid()
+    except OSError:
+        return False
+
+def _rutas(clave, directorio):
+    return (os.path.join(directorio, f"{clave}.comprobantes.arrow"),
+            os.path.join(directorio, f"{clave}.receptores.arrow"),
+            os.path.join(directorio, f"{clave}.mensual.arrow"))
+
+def _escribir_tabla(tabla, ruta):
+    """Escribe una tabla Arrow IPC de forma atómica (archivo temporal + rename)"""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with pa.OSFile(temporal, 'wb') as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    os.chmod(temporal, 0o600)
+    os.replace(temporal, ruta)
+
+def _abrir_tabla(ruta):
+    """Abre una tabla Arrow IPC con memory-map; los buffers apuntan al archivo mapeado"""
+    return pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all()
+
+def guardar_dataset(clave, resultado, receptores, directorio=DIRECTORIO_CACHE):
+    """Guarda la tupla de procesar_comprobantes y el índice de receptores en la caché"""
+    df, facturacion_mensual, _, _, fecha_min, fecha_max, proxima_recategorizacion, meses_restantes = resultado
+    _directorio_privado(directorio)
+    ruta_comprobantes, ruta_receptores, ruta_mensual = _rutas(clave, directorio)
+
+    # Period no tiene tipo Arrow nativo: se guarda como 'YYYY-MM'
+    comprobantes = pa.Table.from_pandas(df.assign(Mes=df['Mes'].astype(str)), preserve_index=False)
+    comprobantes = comprobantes.replace_schema_metadata({
+        'fecha_min': fecha_min.isoformat(),
+        'fecha_max': fecha_max.isoformat(),
+        'proxima_recategorizacion': proxima_recategorizacion.isoformat(),
+        'meses_restantes': str(meses_restantes)
+    })
+    mensual = pa.Table.from_pandas(facturacion_mensual.drop(columns=['Mes_Period']), preserve_index=False)
+
+    # El archivo mensual se escribe último: su existencia indica que el dataset está completo
+    _escribir_tabla(comprobantes, ruta_comprobantes)
+    _escribir_tabla(pa.Table.from_pandas(receptores.reset_index(), preserve_index=False), ruta_receptores)
+    _escribir_tabla(mensual, ruta_mensual)
+    limpiar_cache(directorio, conservar=clave)
+
+def limpiar_cache(directorio=DIRECTORIO_CACHE, max_bytes=MAX_BYTES_CACHE, conservar=None):
+    """
+    Borra los datasets usados hace más tiempo hasta que la caché ocupe a lo sumo
+    max_bytes. Devuelve cuántos datasets borró.
+
+    Los archivos abiertos con memory-map por otras sesiones siguen siendo
+    válidos en POSIX aunque se borren; donde el sistema no lo permite se saltean.
+    """
+    datasets = {}  # clave -> [bytes, último uso, rutas]
+    try:
+        entradas = list(os.scandir(directorio))
+    except FileNotFoundError:
+        return 0
+    for entrada in entradas:
+        if not entrada.name.endswith(('.arrow', '.tmp')):
+            continue
+        try:
+            estado = entrada.stat()
+        except FileNotFoundError:
+            continue
+        dataset = datasets.setdefault(entrada.name.split('.', 1)[0], [0, 0.0, []])
+        dataset[0] += estado.st_size
+        dataset[1] = max(dataset[1], estado.st_mtime)
+        dataset[2].append(entrada.path)
+
+    total = sum(dataset[0] for dataset in datasets.values())
+    borrados = 0
+    for clave, (tamaño, _, rutas) in sorted(datasets.items(), key=lambda item: item[1][1]):
+        if total <= max_bytes:
+            break
+        if clave == conservar:
+            continue
+        for ruta in rutas:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+        total -= tamaño
+        borrados += 1
+    return borrados
+
+def abrir_dataset(clave, directorio=DIRECTORIO_CACHE):
+    """
+    Abre un dataset de la caché con la misma tupla que procesar_comprobantes, o None si no existe.
+
+    Las columnas de los comprobantes quedan respaldadas por Arrow (pd.ArrowDtype) sobre
+    el archivo mapeado, sin copia. La facturación mensual es chica y se convierte a pandas.
+    """
+    ruta_comprobantes, _, ruta_mensual = _rutas(clave, directorio)
+    # Un directorio de otro usuario podría tener datos ajenos o manipulados
+    if not os.path.exists(ruta_mensual) or not _es_privado(directorio):
+        return None
+
+    try:
+        comprobantes = _abrir_tabla(ruta_comprobantes)
+        mensual = _abrir_tabla(ruta_mensual)
+    except (OSError, pa.ArrowInvalid):
+        # Archivo dañado o borrado mientras se abría: se trata como ausente
+        return None
+    try:
+        # Marca el último uso para la limpieza por antigüedad
+        os.utime(ruta_mensual)
+    except OSError:
+        pass
+
+    metadatos = {k.decode(): v.decode() for k, v in comprobantes.schema.metadata.items()}
+    df = comprobantes.to_pandas(types_mapper=pd.ArrowDtype)
+
+    facturacion_mensual = mensual.to_pandas()
+    facturacion_mensual.insert(2, 'Mes_Period', facturacion_mensual['Mes'].dt.to_period('M'))
+    facturacion_historica, facturacion_actual = dividir_periodo(facturacion_mensual)
+
+    return (df, facturacion_mensual, facturacion_historica, facturacion_actual,
+            date.fromisoformat(metadatos['fecha_min']), date.fromisoformat(metadatos['fecha_max']),
+            date.fromisoformat(metadatos['proxima_recategorizacion']), int(metadatos['meses_restantes']))
+
+def abrir_receptores(clave, directorio=DIRECTORIO_CACHE):
+    """Índice ID Receptor -> nombre canónico guardado con el dataset, o None si no existe"""
+    _, ruta_receptores, ruta_mensual = _rutas(clave, directorio)
+    if not os.path.exists(ruta_mensual) or not _es_privado(directorio):
+        return None
+    try:
+        return _abrir_tabla(ruta_receptores).to_pandas().set_index('ID Receptor')['Receptor']
+    except (OSError, pa.ArrowInvalid):
+        return None
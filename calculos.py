@@ -1,3 +1,19 @@
+import numpy as np
+import pandas as pd
+
+# Montos vigentes desde abril 2026 (ARCA/ex-AFIP)
+CATEGORIAS = {
+    'A': 10277988.13, 'B': 15058447.71, 'C': 21113696.52, 'D': 26212853.42,
+    'E': 30833964.37, 'F': 38642048.36, 'G': 46288359.82, 'H': 70185003.97,
+    'I': 78570820.99, 'J': 89946653.09, 'K': 108357084.05
+}
+
+# Porcentaje del límite a partir del cual se alerta por proximidad
+UMBRAL_PROXIMIDAD = 80
+
+# Días hacia adelante que se proyectan los cruces de límite (más allá, la fecha no se informa)
+HORIZONTE_PROYECCION_DIAS = 730
+
 def calcular_facturacion_total(facturacion_mensual):
     """Calcula la facturación total del período"""
     return facturacion_mensual['Imp. Total'].sum()
@@ -26,6 +42,14 @@ def calcular_exceso_facturacion(facturacion_acumulada, limite_categoria):
     """Calcula el exceso de facturación sobre el límite de la categoría"""
     return max(0, facturacion_acumulada - limite_categoria)
 
+def determinar_estado_alerta(facturacion_acumulada, limite_categoria):
+    """Clasifica la situación fiscal: 'exceso', 'proximidad' (80% o más del límite) o 'favorable'"""
+    if calcular_exceso_facturacion(facturacion_acumulada, limite_categoria) > 0:
+        return 'exceso'
+    if (facturacion_acumulada / limite_categoria) * 100 >= UMBRAL_PROXIMIDAD:
+        return 'proximidad'
+    return 'favorable'
+
 def calcular_promedio_mensual_disponible(margen_disponible, meses_restantes):
     """Calcula el promedio mensual disponible para facturar en los meses restantes"""
     if meses_restantes <= 0:
@@ -76,3 +100,144 @@ def analizar_categoria_siguiente(facturacion_acumulada, categoria_actual, catego
 
     return None
 
+def calcular_resumen_recategorizacion(facturacion_mensual, categoria_actual, categorias, meses_restantes):
+    """Calcula las métricas de recategorización del período cargado para la categoría actual"""
+    limite_categoria_actual = categorias[categoria_actual]
+
+    if not facturacion_mensual.empty:
+        facturacion_total = calcular_facturacion_total(facturacion_mensual)
+        facturacion_acumulada = facturacion_mensual['Acumulado'].iloc[-1]
+    else:
+        facturacion_total = 0
+        facturacion_acumulada = 0
+
+    meses_restantes = max(0, meses_restantes)
+    margen_disponible = calcular_margen_disponible(facturacion_acumulada, limite_categoria_actual)
+    exceso_facturacion = calcular_exceso_facturacion(facturacion_acumulada, limite_categoria_actual)
+    categoria_encuadre, limite_encuadre = determinar_categoria_encuadre(facturacion_acumulada, categorias)
+
+    return {
+        'limite_categoria': limite_categoria_actual,
+        'meses_cargados': len(facturacion_mensual),
+        'meses_restantes': meses_restantes,
+        'facturacion_total': facturacion_total,
+        'facturacion_acumulada': facturacion_acumulada,
+        'margen_disponible': margen_disponible,
+        'exceso_facturacion': exceso_facturacion,
+        'promedio_mensual_disponible': calcular_promedio_mensual_disponible(margen_disponible, meses_restantes),
+        'reduccion_mensual_necesaria': calcular_reduccion_necesaria(exceso_facturacion, meses_restantes),
+        'porcentaje_utilizado': (facturacion_acumulada / limite_categoria_actual) * 100,
+        'estado_alerta': determinar_estado_alerta(facturacion_acumulada, limite_categoria_actual),
+        'categoria_encuadre': categoria_encuadre,
+        'limite_encuadre': limite_encuadre,
+        'analisis_siguiente': analizar_categoria_siguiente(facturacion_acumulada, categoria_actual, categorias, meses_restantes)
+    }
+
+def calcular_serie_diaria(df, fecha_desde=None, fecha_hasta=None):
+    """Facturación diaria y acumulada con una fila por día calendario del período"""
+    # np.asarray acepta fechas como objetos date, datetime64 o date32 de Arrow
+    fechas = np.asarray(df['Fecha de Emisión'], dtype='datetime64[D]')
+    importes = df['Imp. Total'].to_numpy(dtype=float)
+
+    desde = fechas.min() if fecha_desde is None else np.datetime64(fecha_desde, 'D')
+    hasta = fechas.max() if fecha_hasta is None else np.datetime64(fecha_hasta, 'D')
+    dias = np.arange(desde, hasta + np.timedelta64(1, 'D'))
+
+    # Suma por día con bincount y un único cumsum para el acumulado
+    posiciones = (fechas - desde).astype(np.int64)
+    en_periodo = (posiciones >= 0) & (posiciones < len(dias))
+    diario = np.bincount(posiciones[en_periodo], weights=importes[en_periodo], minlength=len(dias))
+
+    return pd.DataFrame({'Fecha': dias, 'Imp. Total': diario, 'Acumulado': np.cumsum(diario)})
+
+def calcular_fechas_cruce(serie_diaria, categorias):
+    """Fecha en que el acumulado superó por primera vez el límite de cada categoría (None si no lo superó)"""
+    # Máximo corrido: las notas de crédito pueden bajar el acumulado pero el cruce ya ocurrió
+    maximo = np.maximum.accumulate(serie_diaria['Acumulado'].to_numpy())
+    nombres = list(categorias.keys())
+    posiciones = np.searchsorted(maximo, np.array([categorias[cat] for cat in nombres]), side='right')
+    fechas = serie_diaria['Fecha'].to_numpy()
+
+    return {
+        cat: (pd.Timestamp(fechas[pos]).date() if pos < len(fechas) else None)
+        for cat, pos in zip(nombres, posiciones)
+    }
+
+def proyectar_fechas_cruce(serie_diaria, categorias, dias_ventana=90, horizonte_dias=HORIZONTE_PROYECCION_DIAS):
+    """
+    Proyecta la fecha en que el acumulado superaría el límite de cada categoría
+    manteniendo el ritmo diario promedio de los últimos `dias_ventana` días.
+
+    Las categorías ya superadas devuelven la fecha real de cruce. Las no superadas
+    devuelven None si el ritmo no es positivo o si el cruce cae a más de
+    `horizonte_dias` del último día (con poca actividad serían siglos, fuera del
+    rango de fechas de pandas). Devuelve (fechas por categoría, ritmo diario).
+    """
+    cruces = calcular_fechas_cruce(serie_diaria, categorias)
+    diario = serie_diaria['Imp. Total'].to_numpy()
+    if len(diario) == 0:
+        return cruces, 0.0
+
+    ventana = min(dias_ventana, len(diario))
+    ritmo_diario = diario[-ventana:].sum() / ventana
+    acumulado_final = serie_diaria['Acumulado'].iloc[-1]
+    ultimo_dia = pd.Timestamp(serie_diaria['Fecha'].iloc[-1])
+
+    if ritmo_diario <= 0:
+        return cruces, ritmo_diario
+
+    nombres = [cat for cat in categorias if cruces[cat] is None]
+    limites = np.array([categorias[cat] for cat in nombres], dtype=float)
+    # Primer día con acumulado + dias * ritmo > límite (en float: puede no entrar en int64)
+    dias_faltantes = np.floor((limites - acumulado_final) / ritmo_diario) + 1
+    for cat, dias in zip(nombres, dias_faltantes):
+        if dias <= horizonte_dias:
+            cruces[cat] = (ultimo_dia + pd.Timedelta(days=int(dias))).date()
+    return cruces, ritmo_diario
+
+def meses_siguientes(fecha, cantidad):
+    """Etiquetas 'YYYY-MM' de los `cantidad` meses posteriores al de `fecha`"""
+    if cantidad <= 0:
+        return []
+    return list(pd.period_range(pd.Period(fecha, 'M') + 1, periods=cantidad, freq='M').strftime('%Y-%m'))
+
+def planificar_facturacion(facturacion_acumulada, compromisos, categorias):
+    """
+    Plan de facturación de los meses restantes para todas las categorías a la vez.
+
+    `compromisos` es una Serie con la facturación ya comprometida en cada mes
+    restante (índice: mes). El cálculo es una sola operación sobre la matriz
+    categorías × meses, sin recorrer categorías. Devuelve un dict con:
+    - holgura: margen que queda al cierre de cada mes, límite - (acumulado + compromisos
+      hasta ese mes); negativo si los compromisos ya superan el límite (categorías × meses)
+    - margen_total: margen de cada categoría al final del período
+    - promedio_mensual: margen_total repartido en partes iguales entre los meses restantes
+    - facturacion_proyectada: acumulado al final del período con los compromisos
+    - categoria_minima / limite_minimo: categoría más baja que admite lo planificado
+      (None si excede todas)
+    """
+    nombres = sorted(categorias, key=categorias.get)
+    limites = np.array([categorias[cat] for cat in nombres], dtype=float)
+    meses = list(compromisos.index)
+    comprometido = np.nan_to_num(compromisos.to_numpy(dtype=float))
+
+    # P_m: acumulado proyectado al cierre de cada mes
+    proyectado = facturacion_acumulada + np.cumsum(comprometido)
+    facturacion_proyectada = proyectado[-1] if len(proyectado) else facturacion_acumulada
+
+    holgura = limites[:, None] - proyectado[None, :]
+    margen_total = np.maximum(limites - facturacion_proyectada, 0)
+    promedio_mensual = margen_total / max(len(meses), 1)
+
+    # Primera categoría cuyo límite cubre el total planificado
+    posicion = np.searchsorted(limites, facturacion_proyectada, side='left')
+    categoria_minima = nombres[posicion] if posicion < len(nombres) else None
+
+    return {
+        'holgura': pd.DataFrame(holgura, index=nombres, columns=meses),
+        'margen_total': pd.Series(margen_total, index=nombres),
+        'promedio_mensual': pd.Series(promedio_mensual, index=nombres),
+        'facturacion_proyectada': facturacion_proyectada,
+        'categoria_minima': categoria_minima,
+        'limite_minimo': limites[posicion] if categoria_minima is not None else None
+    }
@@ -0,0 +1,196 @@
+"""
+Control de admisión para el procesamiento de CSV pesados.
+
+Todas las sesiones de Streamlit del proceso comparten una cola acotada de
+trabajos atendida por una cantidad fija de hilos, así unos pocos archivos de
+cientos de MB no saturan la CPU y frenan las re-ejecuciones del resto:
+
+- Carril rápido: los archivos chicos tienen un hilo dedicado y además tienen
+  prioridad en los hilos generales.
+- Equidad por sesión: los trabajos grandes se atienden por turnos entre
+  sesiones (round-robin), una sesión con muchos archivos no acapara la cola.
+- Sin duplicados: un trabajo enviado con una clave que ya está en cola o en
+  proceso devuelve el Trabajo existente, así una re-ejecución que interrumpe
+  la espera (o dos sesiones con el mismo archivo) no procesan dos veces.
+- Métricas: profundidad de la cola y tiempos de espera/proceso, también
+  exportadas a Prometheus si prometheus_client está instalado y se define
+  MONOTRIBUTO_METRICAS_PUERTO.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# Archivos hasta este tamaño van por el carril rápido
+UMBRAL_RAPIDO_BYTES = int(os.environ.get('MONOTRIBUTO_UMBRAL_RAPIDO_MB', '5')) * 1024 * 1024
+# Hilos que atienden archivos grandes (además del hilo del carril rápido)
+TRABAJADORES = int(os.environ.get('MONOTRIBUTO_TRABAJADORES', str(max(1, (os.cpu_count() or 2) // 2))))
+# Trabajos en espera a partir de los cuales se rechazan nuevos
+MAX_EN_COLA = int(os.environ.get('MONOTRIBUTO_MAX_EN_COLA', '50'))
+
+if prometheus_client is not None:
+    _PROFUNDIDAD = prometheus_client.Gauge('monotributo_cola_profundidad', "Trabajos en espera", ['carril'])
+    _PROCESANDO = prometheus_client.Gauge('monotributo_cola_procesando', "Trabajos en proceso")
+    _ESPERA = prometheus_client.Histogram('monotributo_cola_espera_segundos', "Tiempo en cola", ['carril'])
+    _DURACION = prometheus_client.Histogram('monotributo_cola_proceso_segundos', "Tiempo de proceso", ['carril'])
+    _RECHAZADOS = prometheus_client.Counter('monotributo_cola_rechazados', "Trabajos rechazados por cola llena")
+
+
+class ColaLlenaError(RuntimeError):
+    """La cola alcanzó MAX_EN_COLA trabajos en espera"""
+
+
+class Trabajo:
+    """Trabajo encolado; el resultado (o la excepción) queda en `futuro`"""
+
+    def __init__(self, sesion, tamaño, funcion, args, clave=None):
+        self.sesion = sesion
+        self.clave = clave
+        self.tamaño = tamaño
+        self.carril = 'rapido' if tamaño <= UMBRAL_RAPIDO_BYTES else 'general'
+        self.funcion = funcion
+        self.args = args
+        self.futuro = Future()
+        self.estado = 'en_cola'
+        self.encolado_en = time.monotonic()
+        self.iniciado_en = None
+
+
+class ColaTrabajos:
+    def __init__(self, trabajadores=TRABAJADORES, max_en_cola=MAX_EN_COLA):
+        self.max_en_cola = max_en_cola
+        self._condicion = threading.Condition()
+        self._rapidos = deque()
+        self._por_sesion = OrderedDict()  # sesión -> deque de trabajos generales, en orden de turno
+        self._procesando = 0
+        self._en_curso = {}  # clave -> Trabajo en cola o en proceso
+        self._esperas = deque(maxlen=200)
+
+        hilos = [threading.Thread(target=self._atender, args=(True,), name='cola-rapido', daemon=True)]
+        hilos += [threading.Thread(target=self._atender, args=(False,), name=f'cola-general-{i}', daemon=True)
+                  for i in range(trabajadores)]
+        for hilo in hilos:
+            hilo.start()
+
+    def _en_espera(self):
+        return len(self._rapidos) + sum(len(trabajos) for trabajos in self._por_sesion.values())
+
+    def enviar(self, sesion, tamaño, funcion, *args, clave=None):
+        """
+        Encola funcion(*args) para la sesión indicada y devuelve el Trabajo.
+        Si ya hay un trabajo en curso con la misma clave, devuelve ese en lugar de encolar otro.
+        """
+        trabajo = Trabajo(sesion, tamaño, funcion, args, clave)
+        with self._condicion:
+            if clave is not None and clave in self._en_curso:
+                return self._en_curso[clave]
+            if self._en_espera() >= self.max_en_cola:
+                if prometheus_client is not None:
+                    _RECHAZADOS.inc()
+                raise ColaLlenaError("La cola de procesamiento está llena")
+            if trabajo.carril == 'rapido':
+                self._rapidos.append(trabajo)
+            else:
+                self._por_sesion.setdefault(sesion, deque()).append(trabajo)
+            if clave is not None:
+                self._en_curso[clave] = trabajo
+            self._actualizar_profundidad()
+            self._condicion.notify_all()
+        return trabajo
+
+    def posicion(self, trabajo):
+        """Trabajos que se atenderán antes que este (aproximado para el carril general)"""
+        with self._condicion:
+            if trabajo.estado != 'en_cola':
+                return 0
+            if trabajo.carril == 'rapido':
+                return sum(1 for t in self._rapidos if t.encolado_en < trabajo.encolado_en)
+            # Por turnos: cada sesión adelante aporta a lo sumo tantos trabajos como la propia posición
+            propios = self._por_sesion.get(trabajo.sesion, ())
+            turno = sum(1 for t in propios if t.encolado_en < trabajo.encolado_en)
+            return len(self._rapidos) + sum(min(len(trabajos), turno + 1)
+                                            for sesion, trabajos in self._por_sesion.items()
+                                            if sesion != trabajo.sesion) + turno
+
+    def _siguiente(self, solo_rapidos):
+        """Toma el próximo trabajo: primero el carril rápido, luego la siguiente sesión en turno"""
+        if self._rapidos:
+            return self._rapidos.popleft()
+        if solo_rapidos or not self._por_sesion:
+            return None
+        sesion, trabajos = self._por_sesion.popitem(last=False)
+        trabajo = trabajos.popleft()
+        if trabajos:
+            # La sesión vuelve al final de la ronda
+            self._por_sesion[sesion] = trabajos
+        return trabajo
+
+    def _atender(self, solo_rapidos):
+        while True:
+            with self._condicion:
+                trabajo = self._siguiente(solo_rapidos)
+                while trabajo is None:
+                    self._condicion.wait()
+                    trabajo = self._siguiente(solo_rapidos)
+                trabajo.estado = 'procesando'
+                trabajo.iniciado_en = time.monotonic()
+                self._procesando += 1
+                self._esperas.append(trabajo.iniciado_en - trabajo.encolado_en)
+                self._actualizar_profundidad()
+
+            if prometheus_client is not None:
+                _ESPERA.labels(trabajo.carril).observe(trabajo.iniciado_en - trabajo.encolado_en)
+
+            if trabajo.futuro.set_running_or_notify_cancel():
+                try:
+                    trabajo.futuro.set_result(trabajo.funcion(*trabajo.args))
+                except BaseException as e:
+                    trabajo.futuro.set_exception(e)
+
+            if prometheus_client is not None:
+                _DURACION.labels(trabajo.carril).observe(time.monotonic() - trabajo.iniciado_en)
+            with self._condicion:
+                trabajo.estado = 'terminado'
+                if trabajo.clave is not None and self._en_curso.get(trabajo.clave) is trabajo:
+                    del self._en_curso[trabajo.clave]
+                self._procesando -= 1
+                self._actualizar_profundidad()
+
+    def _actualizar_profundidad(self):
+        if prometheus_client is not None:
+            _PROFUNDIDAD.labels('rapido').set(len(self._rapidos))
+            _PROFUNDIDAD.labels('general').set(sum(len(trabajos) for trabajos in self._por_sesion.values()))
+            _PROCESANDO.set(self._procesando)
+
+    def metricas(self):
+        """Profundidad de la cola y tiempos de espera recientes"""
+        with self._condicion:
+            esperas = list(self._esperas)
+            return {
+                'en_cola_rapido': len(self._rapidos),
+                'en_cola_general': sum(len(trabajos) for trabajos in self._por_sesion.values()),
+                'procesando': self._procesando,
+                'espera_media_s': sum(esperas) / len(esperas) if esperas else 0.0,
+                'espera_max_s': max(esperas) if esperas else 0.0
+            }
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+def obtener_cola():
+    """Cola compartida por todas las sesiones del proceso"""
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaTrabajos()
+            puerto = os.environ.get('MONOTRIBUTO_METRICAS_PUERTO')
+            if puerto and prometheus_client is not None:
+                prometheus_client.start_http_server(int(puerto))
+        return _cola
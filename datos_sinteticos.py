@@ -0,0 +1,68 @@
+"""
+Generación de exportaciones sintéticas de Mis Comprobantes -> Emitidos.
+
+Se usan para benchmarks, pruebas de carga y verificación; el CSV tiene el
+mismo formato que descarga ARCA (punto y coma, coma decimal y punto de miles).
+"""
+import numpy as np
+import pandas as pd
+
+from procesamiento import TIPO_NOTA_CREDITO
+
+# Columnas del export de ARCA en su orden original (incluye columnas que el análisis no usa)
+COLUMNAS_EXPORT = [
+    'Fecha de Emisión', 'Tipo de Comprobante', 'Punto de Venta', 'Número Desde', 'Número Hasta',
+    'Cód. Autorización', 'Tipo Doc. Receptor', 'Nro. Doc. Receptor', 'Denominación Receptor',
+    'Tipo Cambio', 'Moneda', 'Imp. Neto Gravado', 'Imp. Neto No Gravado', 'Imp. Op. Exentas',
+    'Otros Tributos', 'IVA', 'Imp. Total'
+]
+
+TIPO_FACTURA = 11
+
+
+def generar_comprobantes(filas, fecha_desde='2025-07-01', dias=365, clientes=200,
+                         proporcion_notas_credito=0.05, importe_medio=150000.0, semilla=None):
+    """Genera comprobantes aleatorios con las columnas del export de ARCA"""
+    rng = np.random.default_rng(semilla)
+
+    fechas = np.datetime64(fecha_desde, 'D') + np.sort(rng.integers(0, dias, filas))
+    tipos = np.where(rng.random(filas) < proporcion_notas_credito, TIPO_NOTA_CREDITO, TIPO_FACTURA)
+    receptores = rng.integers(0, clientes, filas)
+    importes = np.round(rng.lognormal(np.log(importe_medio), 0.8, filas), 2)
+    numeros = np.arange(1, filas + 1)
+
+    return pd.DataFrame({
+        'Fecha de Emisión': pd.to_datetime(fechas).strftime('%Y-%m-%d'),
+        'Tipo de Comprobante': tipos,
+        'Punto de Venta': 1,
+        'Número Desde': numeros,
+        'Número Hasta': numeros,
+        'Cód. Autorización': 75000000000000 + numeros,
+        'Tipo Doc. Receptor': 80,
+        'Nro. Doc. Receptor': 20000000000 + receptores * 1009,
+        'Denominación Receptor': [f"CLIENTE {r:05d} S.R.L." for r in receptores],
+        'Tipo Cambio': 1.0,
+        'Moneda': '$',
+        'Imp. Neto Gravado': 0.0,
+        'Imp. Neto No Gravado': 0.0,
+        'Imp. Op. Exentas': 0.0,
+        'Otros Tributos': 0.0,
+        'IVA': 0.0,
+        'Imp. Total': importes,
+    })[COLUMNAS_EXPORT]
+
+def formatear_importe(importe):
+    """Formatea un importe como en el CSV de ARCA: 1.234.567,89"""
+    return f"{importe:,.2f}".translate(str.maketrans({',': '.', '.': ','}))
+
+def exportar_csv_arca(comprobantes):
+    """Serializa los comprobantes con el formato del CSV de ARCA y devuelve los bytes"""
+    salida = comprobantes.copy()
+    for columna in ['Tipo Cambio', 'Imp. Neto Gravado', 'Imp. Neto No Gravado', 'Imp. Op. Exentas',
+                    'Otros Tributos', 'IVA', 'Imp. Total']:
+        salida[columna] = [formatear_importe(valor) for valor in salida[columna]]
+    return salida.to_csv(sep=';', index=False).encode('utf-8')
+
+def generar_export_arca(filas, **kwargs):
+    """Atajo: genera comprobantes aleatorios y devuelve el CSV listo para procesar"""
+    return exportar_csv_arca(generar_comprobantes(filas, **kwargs))
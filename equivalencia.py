@@ -0,0 +1,578 @@
+"""
+Verificación diferencial de los caminos rápidos contra la referencia escalar.
+
+Genera exports de ARCA aleatorios, incluidos casos borde, y comprueba que cada
+camino optimizado da las mismas cifras que el procesar_csv original (fila por
+fila, copiado abajo tal como estaba en app.py) más las funciones escalares de
+calculos.py. Los casos borde son:
+
+- notas_credito: muchas notas de crédito, varias anulando facturas exactas
+- un_mes: todos los comprobantes en un único mes
+- primer_mes_cero: el primer mes suma exactamente 0 (tasa de crecimiento)
+- limite_exacto: la facturación acumulada es exactamente el límite de una categoría
+- baja_actividad: pocos comprobantes chicos; las proyecciones de cruce caen a
+  siglos de distancia (fuera del rango de fechas de pandas)
+
+Se comparan: lectores pyarrow y pandas, métricas de recategorización, serie
+diaria y fechas de cruce (reales y proyectadas), planificador, caché Arrow, almacén SQLite (facturación
+mensual, resumen y cartera), alertas, emparejamiento de notas de crédito y
+saldos e identificación de receptores.
+
+    python equivalencia.py --rondas 200 --filas 5000 --semilla 1
+
+Termina con código 1 si algún camino no coincide con la referencia.
+"""
+import argparse
+import io
+import math
+import reprlib
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from alertas import evaluar_contribuyente, meses_desde_facturacion_mensual
+from almacen import Almacen
+from cache_arrow import abrir_dataset, clave_dataset, guardar_dataset
+from calculos import (
+    CATEGORIAS,
+    HORIZONTE_PROYECCION_DIAS,
+    analizar_categoria_siguiente,
+    calcular_exceso_facturacion,
+    calcular_facturacion_total,
+    calcular_fechas_cruce,
+    calcular_margen_disponible,
+    calcular_promedio_mensual_disponible,
+    calcular_reduccion_necesaria,
+    calcular_resumen_recategorizacion,
+    calcular_serie_diaria,
+    calcular_tasa_crecimiento_promedio_mensual,
+    determinar_categoria_encuadre,
+    determinar_estado_alerta,
+    planificar_facturacion,
+    proyectar_fechas_cruce
+)
+from datos_sinteticos import TIPO_FACTURA, exportar_csv_arca, generar_comprobantes
+from notas_credito import DIAS_MAXIMOS, calcular_saldos_receptores, emparejar_notas_credito
+from procesamiento import (
+    COLUMNAS_REQUERIDAS,
+    TIPO_NOTA_CREDITO,
+    construir_indice_receptores,
+    leer_csv_arca,
+    obtener_inicio_periodo_recategorizacion,
+    obtener_proxima_recategorizacion,
+    procesar_comprobantes
+)
+
+CASOS = ('aleatorio', 'notas_credito', 'un_mes', 'primer_mes_cero', 'limite_exacto', 'baja_actividad')
+
+# Tolerancia de los importes: sumas en distinto orden pueden diferir en el último bit
+TOLERANCIA_RELATIVA = 1e-9
+TOLERANCIA_ABSOLUTA = 0.005
+
+CUIT_PRUEBA = '20111111112'
+
+
+# =============================================================================
+# Referencia escalar
+# =============================================================================
+
+def procesar_csv_referencia(contenido):
+    """procesar_csv original de app.py (sin Streamlit): lectura con pandas y normalización fila por fila"""
+    df = pd.read_csv(io.BytesIO(contenido), sep=';', encoding='utf-8', decimal=',', thousands='.')
+    df.columns = [col.strip() for col in df.columns]
+    df = df[COLUMNAS_REQUERIDAS].copy()
+
+    df['Nro. Doc. Receptor'] = df['Nro. Doc. Receptor'].astype(str)
+    df['Fecha de Emisión'] = pd.to_datetime(df['Fecha de Emisión'], format='%Y-%m-%d').dt.date
+    df['Imp. Total'] = df.apply(lambda row: -row['Imp. Total'] if row['Tipo de Comprobante'] == 13 else row['Imp. Total'], axis=1)
+    df['Mes'] = pd.to_datetime(df['Fecha de Emisión']).dt.to_period('M')
+
+    # Facturación mensual agrupada
+    facturacion_mensual = df.groupby('Mes')['Imp. Total'].sum().reset_index()
+    facturacion_mensual['Mes_Period'] = facturacion_mensual['Mes']  # Guardar Period
+    facturacion_mensual['Mes'] = facturacion_mensual['Mes'].dt.to_timestamp()
+    facturacion_mensual['Mes_Str'] = facturacion_mensual['Mes'].dt.strftime('%Y-%m')
+    facturacion_mensual['Acumulado'] = facturacion_mensual['Imp. Total'].cumsum()
+
+    fecha_max = df['Fecha de Emisión'].max()
+    fecha_min = df['Fecha de Emisión'].min()
+    proxima_recategorizacion = obtener_proxima_recategorizacion(fecha_max)
+
+    meses_restantes = (proxima_recategorizacion.year - fecha_max.year) * 12 + \
+                     (proxima_recategorizacion.month - fecha_max.month) - 1
+    meses_restantes = max(0, meses_restantes)
+
+    num_meses = len(facturacion_mensual)
+    if num_meses >= 6:
+        mitad = num_meses // 2
+        facturacion_historica = facturacion_mensual.iloc[:mitad].copy()
+        facturacion_actual = facturacion_mensual.iloc[mitad:].copy()
+    else:
+        facturacion_historica = pd.DataFrame()
+        facturacion_actual = facturacion_mensual.copy()
+
+    return df, facturacion_mensual, facturacion_historica, facturacion_actual, fecha_min, fecha_max, proxima_recategorizacion, meses_restantes
+
+def metricas_referencia(facturacion_mensual, categoria_actual, categorias, meses_faltantes):
+    """Sección 4 original de app.py: métricas con las funciones escalares de calculos.py"""
+    limite_categoria_actual = categorias[categoria_actual]
+    if not facturacion_mensual.empty:
+        facturacion_total = calcular_facturacion_total(facturacion_mensual)
+        facturacion_acumulada = facturacion_mensual['Acumulado'].iloc[-1]
+    else:
+        facturacion_total = 0
+        facturacion_acumulada = 0
+
+    meses_restantes = max(0, meses_faltantes)
+    margen_disponible = calcular_margen_disponible(facturacion_acumulada, limite_categoria_actual)
+    exceso_facturacion = calcular_exceso_facturacion(facturacion_acumulada, limite_categoria_actual)
+    categoria_encuadre, limite_encuadre = determinar_categoria_encuadre(facturacion_acumulada, categorias)
+
+    return {
+        'limite_categoria': limite_categoria_actual,
+        'meses_cargados': len(facturacion_mensual),
+        'meses_restantes': meses_restantes,
+        'facturacion_total': facturacion_total,
+        'facturacion_acumulada': facturacion_acumulada,
+        'margen_disponible': margen_disponible,
+        'exceso_facturacion': exceso_facturacion,
+        'promedio_mensual_disponible': calcular_promedio_mensual_disponible(margen_disponible, meses_restantes) if meses_restantes > 0 else 0,
+        'reduccion_mensual_necesaria': calcular_reduccion_necesaria(exceso_facturacion, meses_restantes) if meses_restantes > 0 else 0,
+        'porcentaje_utilizado': (facturacion_acumulada / limite_categoria_actual) * 100,
+        'estado_alerta': determinar_estado_alerta(facturacion_acumulada, limite_categoria_actual),
+        'categoria_encuadre': categoria_encuadre,
+        'limite_encuadre': limite_encuadre,
+        'analisis_siguiente': analizar_categoria_siguiente(facturacion_acumulada, categoria_actual, categorias, meses_restantes)
+    }
+
+def serie_diaria_referencia(df):
+    """Facturación diaria y acumulada sumando comprobante por comprobante"""
+    por_dia = {}
+    for fecha, importe in zip(df['Fecha de Emisión'], df['Imp. Total']):
+        por_dia[fecha] = por_dia.get(fecha, 0.0) + importe
+
+    fechas, diario, acumulado, total = [], [], [], 0.0
+    dia, ultimo = min(por_dia), max(por_dia)
+    while dia <= ultimo:
+        total += por_dia.get(dia, 0.0)
+        fechas.append(dia)
+        diario.append(por_dia.get(dia, 0.0))
+        acumulado.append(total)
+        dia = date.fromordinal(dia.toordinal() + 1)
+    return fechas, diario, acumulado
+
+def fechas_cruce_referencia(fechas, acumulado, categorias):
+    """Primer día en que el máximo acumulado supera cada límite, recorriendo día por día"""
+    cruces = {}
+    for cat, limite in categorias.items():
+        cruces[cat] = None
+        maximo = -math.inf
+        for fecha, valor in zip(fechas, acumulado):
+            maximo = max(maximo, valor)
+            if maximo > limite:
+                cruces[cat] = fecha
+                break
+    return cruces
+
+def proyeccion_cruce_referencia(fechas, diario, acumulado, categorias, dias_ventana=90,
+                                horizonte_dias=HORIZONTE_PROYECCION_DIAS):
+    """Cruces proyectados avanzando día por día con el ritmo promedio de la ventana, hasta el horizonte"""
+    cruces = fechas_cruce_referencia(fechas, acumulado, categorias)
+    ventana = min(dias_ventana, len(diario))
+    ritmo = sum(diario[-ventana:]) / ventana
+    if ritmo <= 0:
+        return cruces
+    for cat, limite in categorias.items():
+        if cruces[cat] is not None:
+            continue
+        for dias in range(1, horizonte_dias + 1):
+            if acumulado[-1] + dias * ritmo > limite:
+                cruces[cat] = date.fromordinal(fechas[-1].toordinal() + dias)
+                break
+    return cruces
+
+def planificar_referencia(facturacion_acumulada, compromisos, categorias):
+    """Plan de facturación categoría por categoría y mes por mes"""
+    total = facturacion_acumulada + sum(compromisos)
+    promedio, holgura = {}, {}
+    for cat, limite in categorias.items():
+        margen = calcular_margen_disponible(total, limite)
+        promedio[cat] = calcular_promedio_mensual_disponible(margen, len(compromisos))
+        proyectado, holgura[cat] = facturacion_acumulada, []
+        for comprometido in compromisos:
+            proyectado += comprometido
+            holgura[cat].append(limite - proyectado)
+    categoria_minima, _ = determinar_categoria_encuadre(total, categorias)
+    return promedio, holgura, total, categoria_minima
+
+def clave_receptor_referencia(nro_doc, denominacion):
+    """Cliente por documento; sin documento (vacío o 0), por denominación"""
+    try:
+        documento = int(float(nro_doc))
+    except ValueError:
+        documento = 0
+    return ('doc', documento) if documento > 0 else ('nombre', denominacion)
+
+def emparejar_referencia(df, dias_maximos=DIAS_MAXIMOS):
+    """
+    Emparejamiento por comparación de pares: para cada nota (en orden cronológico) la
+    factura libre más reciente del mismo receptor e importe, emitida antes o el mismo día.
+    """
+    filas = []
+    for i, (tipo, nro_doc, denominacion, importe, fecha) in enumerate(zip(
+            df['Tipo de Comprobante'], df['Nro. Doc. Receptor'], df['Denominación Receptor'],
+            df['Imp. Total'], df['Fecha de Emisión'])):
+        filas.append((i, int(tipo), clave_receptor_referencia(nro_doc, denominacion),
+                      int(round(abs(importe) * 100)), fecha.toordinal()))
+
+    # Solo se agrupa por receptor; dentro de cada receptor se comparan todos los pares
+    facturas = {}
+    for fila in filas:
+        if fila[1] != TIPO_NOTA_CREDITO:
+            facturas.setdefault(fila[2], []).append(fila)
+    notas = sorted((fila for fila in filas if fila[1] == TIPO_NOTA_CREDITO), key=lambda fila: (fila[4], fila[0]))
+    usadas, resultado = set(), {}
+    for i, _, receptor, centavos, dia in notas:
+        elegida = None
+        for f in facturas.get(receptor, []):
+            if f[3] == centavos and f[4] <= dia and f[0] not in usadas:
+                if elegida is None or (f[4], f[0]) > (elegida[4], elegida[0]):
+                    elegida = f
+        if elegida is not None and dia - elegida[4] <= dias_maximos:
+            usadas.add(elegida[0])
+            resultado[i] = elegida[0]
+    return resultado
+
+
+# =============================================================================
+# Generación de casos
+# =============================================================================
+
+def _renumerar(comprobantes):
+    """Ordena por fecha y numera los comprobantes de forma única (clave del almacén)"""
+    comprobantes = comprobantes.sort_values('Fecha de Emisión', kind='stable').reset_index(drop=True)
+    numeros = np.arange(1, len(comprobantes) + 1)
+    comprobantes['Número Desde'] = numeros
+    comprobantes['Número Hasta'] = numeros
+    return comprobantes
+
+def _anular(comprobantes, filas, rng, dias_max=30):
+    """Agrega notas de crédito que anulan exactamente las facturas indicadas, hasta dias_max días después"""
+    notas = comprobantes.loc[filas].copy()
+    notas['Tipo de Comprobante'] = TIPO_NOTA_CREDITO
+    desfase = pd.to_timedelta(rng.integers(0, dias_max + 1, len(notas)), unit='D')
+    notas['Fecha de Emisión'] = (pd.to_datetime(notas['Fecha de Emisión']) + desfase).dt.strftime('%Y-%m-%d')
+    return pd.concat([comprobantes, notas], ignore_index=True)
+
+def generar_caso(tipo, filas, rng):
+    """Devuelve (comprobantes, categorías) de un caso; las categorías pueden tener un límite ajustado"""
+    semilla = int(rng.integers(2 ** 31))
+    categorias = dict(CATEGORIAS)
+
+    if tipo == 'aleatorio':
+        desde = (pd.Timestamp('2024-01-01') + pd.Timedelta(days=int(rng.integers(0, 730)))).strftime('%Y-%m-%d')
+        comprobantes = generar_comprobantes(
+            filas, fecha_desde=desde, dias=int(rng.integers(1, 731)), clientes=int(rng.integers(1, 500)),
+            proporcion_notas_credito=float(rng.uniform(0, 0.2)), semilla=semilla)
+        # Algunos receptores sin documento (consumidor final), agrupados por denominación
+        sin_documento = rng.random(len(comprobantes)) < 0.05
+        comprobantes.loc[sin_documento, 'Nro. Doc. Receptor'] = 0
+
+    elif tipo == 'notas_credito':
+        comprobantes = generar_comprobantes(filas, clientes=20, proporcion_notas_credito=0.3,
+                                            importe_medio=50000.0, semilla=semilla)
+        # Importes repetidos: varias facturas candidatas por nota
+        comprobantes['Imp. Total'] = np.round(comprobantes['Imp. Total'], -3)
+        facturas = np.flatnonzero(comprobantes['Tipo de Comprobante'].to_numpy() == TIPO_FACTURA)
+        comprobantes = _anular(comprobantes, rng.choice(facturas, len(facturas) // 4, replace=False), rng)
+
+    elif tipo == 'un_mes':
+        mes = int(rng.integers(1, 13))
+        comprobantes = generar_comprobantes(filas, fecha_desde=f'2025-{mes:02d}-01', dias=28, semilla=semilla)
+
+    elif tipo == 'primer_mes_cero':
+        comprobantes = generar_comprobantes(filas, proporcion_notas_credito=0.0, semilla=semilla)
+        # Importes enteros en el primer mes: factura + nota suman exactamente 0
+        primer_mes = comprobantes['Fecha de Emisión'].str[:7] == comprobantes['Fecha de Emisión'].str[:7].min()
+        comprobantes.loc[primer_mes, 'Imp. Total'] = np.round(comprobantes.loc[primer_mes, 'Imp. Total'])
+        comprobantes = _anular(comprobantes, np.flatnonzero(primer_mes.to_numpy()), rng, dias_max=0)
+
+    elif tipo == 'limite_exacto':
+        comprobantes = generar_comprobantes(filas, proporcion_notas_credito=0.05, semilla=semilla)
+        comprobantes.loc[0, 'Tipo de Comprobante'] = TIPO_FACTURA
+        es_nota = comprobantes['Tipo de Comprobante'] == TIPO_NOTA_CREDITO
+        if comprobantes.loc[es_nota, 'Imp. Total'].sum() >= comprobantes.loc[~es_nota, 'Imp. Total'].sum():
+            comprobantes['Tipo de Comprobante'] = TIPO_FACTURA
+        signo = np.where(comprobantes['Tipo de Comprobante'] == TIPO_NOTA_CREDITO, -1.0, 1.0)
+        # Importes enteros escalados para que el total sea el límite de una categoría al azar
+        categoria = str(rng.choice(list(categorias.keys())))
+        objetivo = float(round(categorias[categoria]))
+        importes = np.round(comprobantes['Imp. Total'].to_numpy() * objetivo / (signo * comprobantes['Imp. Total']).sum())
+        mayor = int(np.argmax(importes * (signo > 0)))
+        importes[mayor] += objetivo - float((signo * importes).sum())
+        comprobantes['Imp. Total'] = importes
+        # Total exactamente en el límite (sumas de enteros: exactas en punto flotante)
+        categorias[categoria] = objetivo
+
+    elif tipo == 'baja_actividad':
+        # Unas decenas de pesos por día: el ritmo queda muy por debajo de límite / 106.751 días
+        comprobantes = generar_comprobantes(min(filas, 50), clientes=5, importe_medio=200.0, semilla=semilla)
+
+    else:
+        raise ValueError(f"Caso desconocido: {tipo}")
+
+    return _renumerar(comprobantes), categorias
+
+
+# =============================================================================
+# Comparación
+# =============================================================================
+
+class Verificacion:
+    """Acumula las diferencias encontradas en una ronda"""
+
+    def __init__(self):
+        self.fallas = []
+        self.comparaciones = 0
+
+    def valor(self, nombre, esperado, obtenido):
+        self.comparaciones += 1
+        if isinstance(esperado, list) and isinstance(obtenido, list) and len(esperado) == len(obtenido):
+            # Listas: se informa la primera posición distinta
+            for posicion, (a, b) in enumerate(zip(esperado, obtenido)):
+                if not _iguales(a, b):
+                    self.fallas.append(f"{nombre}[{posicion}]: esperado {a!r}, obtenido {b!r}")
+                    return
+        elif not _iguales(esperado, obtenido):
+            self.fallas.append(f"{nombre}: esperado {reprlib.repr(esperado)}, obtenido {reprlib.repr(obtenido)}")
+
+    def importes(self, nombre, esperado, obtenido):
+        self.comparaciones += 1
+        esperado = np.asarray(esperado, dtype=float)
+        obtenido = np.asarray(obtenido, dtype=float)
+        if esperado.shape != obtenido.shape:
+            self.fallas.append(f"{nombre}: {esperado.shape} valores esperados, {obtenido.shape} obtenidos")
+        elif not np.allclose(esperado, obtenido, rtol=TOLERANCIA_RELATIVA, atol=TOLERANCIA_ABSOLUTA, equal_nan=True):
+            diferencia = int(np.argmax(~np.isclose(esperado, obtenido, rtol=TOLERANCIA_RELATIVA,
+                                                   atol=TOLERANCIA_ABSOLUTA, equal_nan=True)))
+            self.fallas.append(f"{nombre}[{diferencia}]: esperado {esperado[diferencia]!r}, "
+                               f"obtenido {obtenido[diferencia]!r}")
+
+    def mensual(self, nombre, esperado, obtenido):
+        self.valor(f"{nombre}.Mes_Str", list(esperado['Mes_Str']), list(obtenido['Mes_Str']))
+        if len(esperado) == len(obtenido):
+            self.importes(f"{nombre}.Imp. Total", esperado['Imp. Total'], obtenido['Imp. Total'])
+            self.importes(f"{nombre}.Acumulado", esperado['Acumulado'], obtenido['Acumulado'])
+
+    def diccionario(self, nombre, esperado, obtenido):
+        for clave, valor in esperado.items():
+            if clave not in obtenido:
+                self.fallas.append(f"{nombre}: falta la clave {clave!r}")
+            elif isinstance(valor, dict):
+                self.diccionario(f"{nombre}.{clave}", valor, obtenido[clave] or {})
+            else:
+                self.valor(f"{nombre}.{clave}", valor, obtenido[clave])
+
+def _iguales(esperado, obtenido):
+    if isinstance(esperado, (float, np.floating)) or isinstance(obtenido, (float, np.floating)):
+        if esperado is None or obtenido is None:
+            return esperado is None and obtenido is None
+        esperado, obtenido = float(esperado), float(obtenido)
+        if math.isnan(esperado) or math.isnan(obtenido):
+            return math.isnan(esperado) and math.isnan(obtenido)
+        if math.isinf(esperado) or math.isinf(obtenido):
+            return esperado == obtenido
+        return math.isclose(esperado, obtenido, rel_tol=TOLERANCIA_RELATIVA, abs_tol=TOLERANCIA_ABSOLUTA)
+    if isinstance(esperado, datetime) or isinstance(obtenido, datetime):
+        return pd.Timestamp(esperado).date() == pd.Timestamp(obtenido).date()
+    return esperado == obtenido
+
+def _resultado(v, nombre, referencia, obtenido):
+    """Compara dos tuplas de procesar_csv"""
+    df_ref, mensual_ref, historica_ref, actual_ref, fecha_min, fecha_max, proxima, meses_restantes = referencia
+    df, mensual, historica, actual = obtenido[:4]
+
+    v.valor(f"{nombre}.filas", len(df_ref), len(df))
+    if len(df_ref) == len(df):
+        v.importes(f"{nombre}.Imp. Total", df_ref['Imp. Total'], df['Imp. Total'])
+        v.valor(f"{nombre}.Fecha de Emisión", list(np.asarray(df_ref['Fecha de Emisión'], dtype='datetime64[D]')),
+                list(np.asarray(df['Fecha de Emisión'], dtype='datetime64[D]')))
+        v.valor(f"{nombre}.Mes", list(df_ref['Mes'].astype(str)), list(df['Mes'].astype(str)))
+        for columna in ('Tipo de Comprobante', 'Punto de Venta', 'Número Desde', 'Número Hasta'):
+            v.valor(f"{nombre}.{columna}", list(np.asarray(df_ref[columna], dtype='int64')),
+                    list(np.asarray(df[columna], dtype='int64')))
+        v.valor(f"{nombre}.Nro. Doc. Receptor", list(df_ref['Nro. Doc. Receptor']), list(df['Nro. Doc. Receptor'].astype(str)))
+        v.valor(f"{nombre}.Denominación Receptor", list(df_ref['Denominación Receptor']), list(df['Denominación Receptor']))
+
+    v.mensual(f"{nombre}.facturacion_mensual", mensual_ref, mensual)
+    v.valor(f"{nombre}.meses_historicos", len(historica_ref), len(historica))
+    v.valor(f"{nombre}.meses_actuales", len(actual_ref), len(actual))
+    for campo, esperado, valor in zip(('fecha_min', 'fecha_max', 'proxima_recategorizacion', 'meses_restantes'),
+                                      (fecha_min, fecha_max, proxima, meses_restantes), obtenido[4:8]):
+        v.valor(f"{nombre}.{campo}", esperado, valor)
+
+
+# =============================================================================
+# Ronda
+# =============================================================================
+
+def verificar_caso(comprobantes, categorias, categoria, rng, directorio_cache):
+    """Ejecuta todos los caminos rápidos sobre un export y los compara con la referencia"""
+    v = Verificacion()
+    contenido = exportar_csv_arca(comprobantes)
+    referencia = procesar_csv_referencia(contenido)
+    df_ref, mensual_ref = referencia[0], referencia[1]
+
+    # Lectores y normalización
+    resultados = {}
+    for motor in ('pandas', 'pyarrow'):
+        resultados[motor] = procesar_comprobantes(leer_csv_arca(io.BytesIO(contenido), motor=motor))
+        _resultado(v, f"procesar_comprobantes[{motor}]", referencia, resultados[motor])
+    rapido = resultados['pyarrow']
+    df, mensual, meses_restantes = rapido[0], rapido[1], rapido[7]
+
+    # Métricas de recategorización y tasa de crecimiento
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v.diccionario("resumen", metricas_referencia(mensual_ref, categoria, categorias, referencia[7]),
+                      calcular_resumen_recategorizacion(mensual, categoria, categorias, meses_restantes))
+        v.valor("tasa_crecimiento", calcular_tasa_crecimiento_promedio_mensual(mensual_ref),
+                calcular_tasa_crecimiento_promedio_mensual(mensual))
+
+    # Serie diaria: día por día, y sumada por mes contra la facturación mensual
+    fechas, diario, acumulado = serie_diaria_referencia(df_ref)
+    serie = calcular_serie_diaria(df)
+    v.valor("serie_diaria.dias", len(fechas), len(serie))
+    if len(fechas) == len(serie):
+        v.importes("serie_diaria.Imp. Total", diario, serie['Imp. Total'])
+        v.importes("serie_diaria.Acumulado", acumulado, serie['Acumulado'])
+    por_mes = serie.groupby(pd.to_datetime(serie['Fecha']).dt.strftime('%Y-%m'))['Imp. Total'].sum()
+    v.importes("serie_diaria.por_mes", mensual_ref['Imp. Total'], por_mes.reindex(mensual_ref['Mes_Str']).fillna(0.0))
+    v.diccionario("fechas_cruce", fechas_cruce_referencia(fechas, acumulado, categorias),
+                  calcular_fechas_cruce(serie, categorias))
+    v.diccionario("fechas_cruce_proyectadas", proyeccion_cruce_referencia(fechas, diario, acumulado, categorias),
+                  proyectar_fechas_cruce(serie, categorias)[0])
+
+    # Planificador con compromisos al azar (incluye meses sin compromisos)
+    if meses_restantes > 0:
+        compromisos = np.round(rng.uniform(0, 2e6, meses_restantes) * (rng.random(meses_restantes) < 0.7), 2)
+        acumulado_total = mensual_ref['Acumulado'].iloc[-1]
+        promedio, holgura, total, categoria_minima = planificar_referencia(acumulado_total, list(compromisos), categorias)
+        plan = planificar_facturacion(acumulado_total, pd.Series(compromisos, index=range(meses_restantes)), categorias)
+        v.valor("plan.facturacion_proyectada", total, plan['facturacion_proyectada'])
+        v.valor("plan.categoria_minima", categoria_minima, plan['categoria_minima'])
+        for cat in categorias:
+            v.importes(f"plan.promedio_mensual[{cat}]", [promedio[cat]], [plan['promedio_mensual'].loc[cat]])
+            v.importes(f"plan.holgura[{cat}]", holgura[cat], plan['holgura'].loc[cat])
+
+    # Caché Arrow: guardar y reabrir con memory-map
+    clave = clave_dataset(contenido)
+    guardar_dataset(clave, rapido, construir_indice_receptores(df), directorio_cache)
+    _resultado(v, "cache_arrow", referencia, abrir_dataset(clave, directorio_cache))
+
+    # Almacén SQLite y alertas: período de la próxima recategorización
+    inicio = obtener_inicio_periodo_recategorizacion(referencia[6]).strftime('%Y-%m')
+    ventana_ref = mensual_ref[mensual_ref['Mes_Str'] >= inicio].copy()
+    ventana_ref['Acumulado'] = ventana_ref['Imp. Total'].cumsum()
+    esperado = metricas_referencia(ventana_ref, categoria, categorias, referencia[7])
+
+    with Almacen(':memory:') as almacen:
+        almacen.registrar_contribuyente(CUIT_PRUEBA, "Contribuyente de prueba", categoria)
+        almacen.insertar_comprobantes(CUIT_PRUEBA, df)
+        v.mensual("almacen.facturacion_mensual", mensual_ref, almacen.leer_facturacion_mensual(CUIT_PRUEBA))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resumen = almacen.resumen_contribuyente(CUIT_PRUEBA, categorias)
+        for campo in ('facturacion_acumulada', 'margen_disponible', 'exceso_facturacion', 'meses_restantes',
+                      'estado_alerta', 'categoria_encuadre', 'promedio_mensual_disponible'):
+            v.valor(f"almacen.resumen.{campo}", esperado[campo], resumen[campo])
+
+        almacen.recalcular_resumenes(categorias)
+        cartera, total = almacen.leer_resumenes(busqueda=CUIT_PRUEBA)
+        v.valor("almacen.cartera.filas", 1, total)
+        if total == 1:
+            fila = cartera.iloc[0]
+            for campo in ('facturacion_acumulada', 'margen_disponible', 'porcentaje_utilizado', 'meses_restantes',
+                          'estado_alerta'):
+                v.valor(f"almacen.cartera.{campo}", esperado[campo], fila[campo])
+            v.valor("almacen.cartera.exceso", esperado['exceso_facturacion'] > 0, bool(fila['exceso']))
+
+    evaluacion = evaluar_contribuyente(
+        {'nombre': "Contribuyente de prueba", 'categoria': categoria, 'meses': meses_desde_facturacion_mensual(mensual)},
+        categorias)
+    for campo, clave_ref in (('estado', 'estado_alerta'), ('facturacion_acumulada', 'facturacion_acumulada'),
+                             ('margen_disponible', 'margen_disponible'), ('categoria_encuadre', 'categoria_encuadre'),
+                             ('meses_restantes', 'meses_restantes')):
+        v.valor(f"alertas.{campo}", esperado[clave_ref], evaluacion[campo])
+
+    # Receptores: ID Receptor agrupa exactamente como documento / denominación
+    claves_ref = [clave_receptor_referencia(doc, nombre)
+                  for doc, nombre in zip(df_ref['Nro. Doc. Receptor'], df_ref['Denominación Receptor'])]
+    pares = set(zip(claves_ref, df['ID Receptor'].tolist()))
+    v.valor("receptores.agrupacion", len(set(claves_ref)), len(pares))
+    v.valor("receptores.cantidad", len(set(claves_ref)), df['ID Receptor'].nunique())
+
+    # Saldos por receptor
+    saldos_ref = {}
+    for clave_ref, tipo, importe in zip(claves_ref, df_ref['Tipo de Comprobante'], df_ref['Imp. Total']):
+        facturado, notas = saldos_ref.get(clave_ref, (0.0, 0.0))
+        saldos_ref[clave_ref] = (facturado, notas - importe) if tipo == TIPO_NOTA_CREDITO else (facturado + importe, notas)
+    id_a_clave = {id_receptor: clave_ref for clave_ref, id_receptor in pares}
+    saldos = calcular_saldos_receptores(df)
+    esperados = [saldos_ref[id_a_clave[id_receptor]] for id_receptor in saldos['ID Receptor']]
+    v.importes("saldos.Facturado", [f for f, _ in esperados], saldos['Facturado'])
+    v.importes("saldos.Notas de Crédito", [n for _, n in esperados], saldos['Notas de Crédito'])
+
+    # Emparejamiento de notas de crédito contra comparación de pares
+    emparejamientos_ref = emparejar_referencia(df_ref)
+    notas = np.flatnonzero(df_ref['Tipo de Comprobante'].to_numpy() == TIPO_NOTA_CREDITO)
+    esperado_facturas = [
+        int(df_ref['Número Desde'].iloc[emparejamientos_ref[i]]) if i in emparejamientos_ref else None
+        for i in notas.tolist()
+    ]
+    obtenido_facturas = [None if pd.isna(numero) else int(numero)
+                         for numero in emparejar_notas_credito(df)['Factura Número']]
+    v.valor("notas_credito.vinculadas", sum(f is not None for f in esperado_facturas),
+            sum(f is not None for f in obtenido_facturas))
+    v.valor("notas_credito.facturas", esperado_facturas, obtenido_facturas)
+
+    return v
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los caminos rápidos con la referencia escalar")
+    parser.add_argument('--rondas', type=int, default=50, help="Exports a generar por caso")
+    parser.add_argument('--filas', type=int, default=2000, help="Comprobantes por export (máximo; se sortea)")
+    parser.add_argument('--semilla', type=int, default=None)
+    parser.add_argument('--casos', nargs='+', choices=CASOS, default=list(CASOS))
+    args = parser.parse_args()
+
+    semilla = args.semilla if args.semilla is not None else int(time.time())
+    rng = np.random.default_rng(semilla)
+    print(f"Semilla: {semilla}")
+
+    total_fallas = 0
+    with tempfile.TemporaryDirectory() as directorio_cache:
+        for caso in args.casos:
+            inicio = time.perf_counter()
+            comparaciones, fallas_caso = 0, 0
+            for ronda in range(args.rondas):
+                filas = int(rng.integers(1, args.filas + 1))
+                comprobantes, categorias = generar_caso(caso, filas, rng)
+                categoria = str(rng.choice(list(categorias.keys())))
+                verificacion = verificar_caso(comprobantes, categorias, categoria, rng, directorio_cache)
+                comparaciones += verificacion.comparaciones
+                if verificacion.fallas:
+                    fallas_caso += 1
+                    print(f"❌ {caso} ronda {ronda} ({filas} comprobantes, categoría {categoria}):")
+                    for falla in verificacion.fallas[:10]:
+                        print(f"   {falla}")
+            total_fallas += fallas_caso
+            print(f"{'✅' if not fallas_caso else '❌'} {caso}: {args.rondas - fallas_caso}/{args.rondas} rondas "
+                  f"coinciden | {comparaciones} comparaciones | {time.perf_counter() - inicio:.1f} s")
+
+    sys.exit(1 if total_fallas else 0)
+
+if __name__ == "__main__":
+    main()
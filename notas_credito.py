@@ -0,0 +1,128 @@
+"""
+Emparejamiento de Notas de Crédito C con las facturas que anulan.
+
+Cada nota de crédito se vincula con una factura del mismo receptor y por el
+mismo importe, emitida en la misma fecha o antes. Las facturas candidatas se
+buscan en un índice hash por (ID Receptor, importe en centavos) que guarda sus
+fechas ordenadas, así cada nota se resuelve con una búsqueda binaria en lugar
+de recorrer todas las facturas. El emparejamiento es uno a uno: se elige la
+factura libre más reciente, y una factura ya usada no vuelve a asignarse.
+"""
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+from procesamiento import TIPO_NOTA_CREDITO
+
+# Antigüedad máxima (en días) de la factura que anula una nota de crédito
+DIAS_MAXIMOS = 365
+
+
+def _centavos(importes):
+    return np.rint(np.abs(importes) * 100).astype(np.int64)
+
+def _dias(fechas):
+    # np.asarray acepta fechas como objetos date, datetime64 o date32 de Arrow
+    return np.asarray(fechas, dtype='datetime64[D]').astype(np.int64)
+
+def construir_indice_facturas(receptores, centavos, dias):
+    """
+    Índice hash (ID Receptor, centavos) -> (inicio, fin) sobre el orden devuelto.
+
+    Devuelve (índice, orden): `orden` ordena las facturas por receptor, importe y
+    fecha, así las fechas de cada clave quedan contiguas y ordenadas.
+    """
+    orden = np.lexsort((dias, centavos, receptores))
+    r, c = receptores[orden], centavos[orden]
+    cortes = np.flatnonzero((r[1:] != r[:-1]) | (c[1:] != c[:-1])) + 1
+    inicios = np.concatenate(([0], cortes))
+    fines = np.concatenate((cortes, [len(orden)]))
+    indice = {
+        (receptor, importe): (inicio, fin)
+        for receptor, importe, inicio, fin in zip(r[inicios].tolist(), c[inicios].tolist(),
+                                                  inicios.tolist(), fines.tolist())
+    } if len(orden) else {}
+    return indice, orden
+
+def _buscar_libre(libre, posicion, inicio):
+    """Última factura sin usar en [inicio, posicion] (union-find con compresión de caminos), o -1"""
+    raiz = posicion
+    while raiz >= inicio and libre[raiz] != raiz:
+        raiz = libre[raiz]
+    while posicion >= inicio and libre[posicion] != posicion:
+        libre[posicion], posicion = raiz, libre[posicion]
+    return raiz if raiz >= inicio else -1
+
+def emparejar_notas_credito(df, dias_maximos=DIAS_MAXIMOS):
+    """
+    Vincula cada Nota de Crédito C (tipo 13) con la factura que anula.
+
+    Devuelve un DataFrame con una fila por nota de crédito (importe en positivo) y
+    los datos de la factura vinculada: Factura Fecha, Factura Punto de Venta,
+    Factura Número y Días entre ambas. Las notas sin factura candidata quedan vacías.
+    """
+    tipos = df['Tipo de Comprobante'].to_numpy(dtype='int64')
+    es_nota = tipos == TIPO_NOTA_CREDITO
+    receptores = df['ID Receptor'].to_numpy(dtype='int64')
+    centavos = _centavos(df['Imp. Total'].to_numpy(dtype=float))
+    dias = _dias(df['Fecha de Emisión'])
+
+    facturas = np.flatnonzero(~es_nota)
+    notas = np.flatnonzero(es_nota)
+    indice, orden = construir_indice_facturas(receptores[facturas], centavos[facturas], dias[facturas])
+    dias_ordenados = dias[facturas][orden].tolist()
+    libre = list(range(len(orden)))
+    claves = list(zip(receptores[notas].tolist(), centavos[notas].tolist()))
+    dias_notas = dias[notas].tolist()
+
+    elegidas = np.full(len(notas), -1, dtype=np.int64)
+    # Notas en orden cronológico: las más antiguas eligen primero
+    for j in np.argsort(dias[notas], kind='stable').tolist():
+        rango = indice.get(claves[j])
+        if rango is None:
+            continue
+        inicio, fin = rango
+        # Última factura con la misma fecha o anterior a la nota
+        posicion = bisect_right(dias_ordenados, dias_notas[j], inicio, fin) - 1
+        elegida = _buscar_libre(libre, posicion, inicio)
+        if elegida < 0 or dias_notas[j] - dias_ordenados[elegida] > dias_maximos:
+            continue
+        libre[elegida] = elegida - 1
+        elegidas[j] = elegida
+
+    sin_factura = elegidas < 0
+    # Las notas sin factura apuntan a una fila cualquiera; quedan enmascaradas abajo
+    if len(orden):
+        filas_factura = facturas[orden[np.where(sin_factura, 0, elegidas)]]
+    else:
+        filas_factura = np.zeros(len(notas), dtype=np.int64)
+    fechas_factura = dias[filas_factura].astype('datetime64[D]')
+    fechas_factura[sin_factura] = np.datetime64('NaT')
+
+    def _opcional(valores):
+        return pd.arrays.IntegerArray(np.asarray(valores, dtype='int64'), sin_factura.copy())
+
+    return pd.DataFrame({
+        'Fecha de Emisión': df['Fecha de Emisión'].to_numpy()[notas],
+        'Punto de Venta': df['Punto de Venta'].to_numpy()[notas],
+        'Número Desde': df['Número Desde'].to_numpy()[notas],
+        'ID Receptor': receptores[notas],
+        'Imp. Total': centavos[notas] / 100,
+        'Factura Fecha': pd.to_datetime(fechas_factura),
+        'Factura Punto de Venta': _opcional(df['Punto de Venta'].to_numpy(dtype='int64')[filas_factura]),
+        'Factura Número': _opcional(df['Número Desde'].to_numpy(dtype='int64')[filas_factura]),
+        'Días': _opcional(dias[notas] - dias[filas_factura])
+    })
+
+def calcular_saldos_receptores(df):
+    """Facturado, notas de crédito y saldo neto por ID Receptor (notas de crédito en positivo)"""
+    es_nota = df['Tipo de Comprobante'].to_numpy(dtype='int64') == TIPO_NOTA_CREDITO
+    importes = df['Imp. Total'].to_numpy(dtype=float)
+    saldos = pd.DataFrame({
+        'ID Receptor': df['ID Receptor'].to_numpy(dtype='int64'),
+        'Facturado': np.where(es_nota, 0.0, importes),
+        'Notas de Crédito': np.where(es_nota, -importes, 0.0)
+    }).groupby('ID Receptor').sum()
+    saldos['Saldo Neto'] = saldos['Facturado'] - saldos['Notas de Crédito']
+    return saldos.reset_index()
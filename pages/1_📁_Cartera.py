@@ -0,0 +1,112 @@
+"""
+Cartera de clientes: todos los contribuyentes del almacén en una tabla paginada.
+
+Lee el resumen precalculado de almacen.py (tabla resumen_clientes). El orden y
+los filtros se hacen en SQL sobre los índices del resumen, sin volver a procesar
+comprobantes, y la paginación es por cursor (anterior/siguiente): cada página
+arranca en el índice donde terminó la anterior. Solo el total de filas del
+filtro recorre la tabla, así que ese conteo crece con la cantidad de clientes.
+"""
+import os
+import sys
+
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacen import ORDENES_CARTERA, Almacen, cursor_siguiente
+from calculos import CATEGORIAS
+from visualizacion import FILAS_POR_PAGINA
+
+RUTA_ALMACEN = os.environ.get('MONOTRIBUTO_ALMACEN', 'comprobantes.sqlite')
+
+ETIQUETAS_ESTADO = {'exceso': "🔴 Exceso", 'proximidad': "🟡 Proximidad", 'favorable': "🟢 Favorable"}
+
+
+def main():
+    st.set_page_config(layout="wide", page_title="Cartera de Clientes", page_icon=":bar_chart:")
+    st.title('📁 Cartera de Clientes')
+
+    if not os.path.exists(RUTA_ALMACEN):
+        st.info(f"No se encontró el almacén `{RUTA_ALMACEN}`. Importá clientes con `python almacen.py importar` "
+                "o con `python vigilancia.py` (la ruta se configura con MONOTRIBUTO_ALMACEN).")
+        return
+
+    # Filtros y orden
+    col1, col2, col3, col4 = st.columns([3, 1, 2, 1])
+    with col1:
+        busqueda = st.text_input("Buscar por nombre o CUIT", placeholder="Ej: Juan Pérez o 2012345",
+                                 help="Busca los clientes cuyo nombre o CUIT empieza con el texto")
+    with col2:
+        categoria = st.selectbox("Categoría", [""] + list(CATEGORIAS.keys()), format_func=lambda c: c or "Todas")
+    with col3:
+        orden = st.selectbox("Ordenar por", list(ORDENES_CARTERA.keys()), format_func=ORDENES_CARTERA.get)
+    with col4:
+        descendente = st.toggle("Descendente", value=True)
+    solo_exceso = st.checkbox("Solo clientes con exceso de facturación")
+
+    # Cursores de las páginas visitadas después de la primera; un filtro u orden nuevo vuelve a empezar
+    filtro = (busqueda.strip(), categoria, orden, descendente, solo_exceso)
+    if st.session_state.get('filtro_cartera') != filtro:
+        st.session_state['filtro_cartera'] = filtro
+        st.session_state['cursores_cartera'] = []
+    cursores = st.session_state['cursores_cartera']
+
+    with Almacen(RUTA_ALMACEN) as almacen:
+        pagina, total = almacen.leer_resumenes(
+            orden=orden, descendente=descendente, busqueda=busqueda.strip() or None,
+            categoria=categoria or None, solo_exceso=solo_exceso,
+            limite=FILAS_POR_PAGINA, despues_de=cursores[-1] if cursores else None
+        )
+
+    if pagina.empty and cursores:
+        # Se borraron clientes y la página guardada quedó vacía
+        cursores.clear()
+        st.rerun()
+
+    paginas = max(1, -(-total // FILAS_POR_PAGINA))
+    pagina_actual = len(cursores) + 1
+    st.caption(f"{total:,} clientes | página {pagina_actual} de {paginas}")
+
+    if pagina.empty:
+        st.warning("No hay clientes que coincidan con el filtro.")
+        return
+
+    tabla = pagina.assign(estado_alerta=pagina['estado_alerta'].map(ETIQUETAS_ESTADO)).rename(columns={
+        'cuit': 'CUIT',
+        'nombre': 'Nombre',
+        'categoria': 'Categoría',
+        'ultimo_mes': 'Último mes',
+        'proxima_recategorizacion': 'Próxima recategorización',
+        'meses_restantes': 'Meses restantes',
+        'facturacion_acumulada': 'Facturación acumulada',
+        'limite_categoria': 'Límite',
+        'margen_disponible': 'Margen disponible',
+        'porcentaje_utilizado': '% utilizado',
+        'exceso': 'Exceso',
+        'estado_alerta': 'Estado'
+    })
+    st.dataframe(
+        tabla.style.format({
+            'Facturación acumulada': '${:,.2f}',
+            'Límite': '${:,.2f}',
+            'Margen disponible': '${:,.2f}',
+            '% utilizado': '{:.1f}%'
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    if paginas > 1:
+        col1, col2, _ = st.columns([1, 1, 6])
+        with col1:
+            if st.button("← Anterior", disabled=not cursores, use_container_width=True):
+                cursores.pop()
+                st.rerun()
+        with col2:
+            if st.button("Siguiente →", disabled=pagina_actual >= paginas, use_container_width=True):
+                cursores.append(cursor_siguiente(pagina, orden))
+                st.rerun()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Modo de perfilado opcional para la app y los procesos por lote.
+
+Se activa con la variable de entorno MONOTRIBUTO_PERFIL=1 o, en la app, con
+el parámetro ?perfil=1 en la URL. El parámetro solo se respeta si el servidor
+lo habilita con MONOTRIBUTO_PERFIL_URL=1, para que un visitante de la app
+pública no pueda activarlo. Mientras está activo se registra:
+
+- Un perfil de CPU por muestreo: un hilo toma la pila de los hilos perfilados
+  (el que inicia el perfil y los que ejecutan funciones envueltas con
+  en_hilo_perfilado, p. ej. en la cola de trabajos) cada pocos milisegundos con sys._current_frames() y la acumula en formato
+  "collapsed" (una línea "marco;marco;marco cantidad"), que abren directamente
+  speedscope o flamegraph.pl.
+- Estadísticas de memoria con tracemalloc: pico y líneas que más asignan.
+  tracemalloc es global al proceso: se inicia con el primer perfil activo y se
+  detiene con el último, y si hubo perfiles simultáneos (varias sesiones) las
+  cifras de memoria incluyen las asignaciones de todas; el resumen lo indica
+  en 'perfiles_simultaneos'.
+- Tiempos de las secciones marcadas con seccion("nombre").
+
+Cada perfil se guarda en MONOTRIBUTO_PERFILES (por defecto un directorio
+temporal). Apagado, perfilar() devuelve un nullcontext y seccion() no mide
+nada, así las sesiones normales no pagan ningún costo.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+DIRECTORIO_PERFILES = os.environ.get('MONOTRIBUTO_PERFILES', os.path.join(tempfile.gettempdir(), 'monotributo_perfiles'))
+# Segundos entre muestras de la pila
+INTERVALO_MUESTREO = 0.005
+# Marcos de pila que guarda tracemalloc por asignación y líneas informadas
+MARCOS_MEMORIA = 10
+LINEAS_MEMORIA = 30
+
+_local = threading.local()
+
+# Perfiles activos en el proceso: tracemalloc se inicia con el primero y se detiene con el último
+_tracemalloc_lock = threading.Lock()
+_perfiles_activos = set()
+_tracemalloc_propio = False
+
+
+def perfil_solicitado(parametro=None):
+    """
+    True si el perfilado está pedido por MONOTRIBUTO_PERFIL o por el parámetro
+    de la URL (este último solo si MONOTRIBUTO_PERFIL_URL=1 lo habilita)
+    """
+    if os.environ.get('MONOTRIBUTO_PERFIL', '') == '1':
+        return True
+    return parametro == '1' and os.environ.get('MONOTRIBUTO_PERFIL_URL', '') == '1'
+
+def _iniciar_tracemalloc(perfil):
+    """
+    Registra un perfil activo. Cada perfil activo guarda en `simultaneos` la mayor
+    cantidad de perfiles que hubo a la vez durante su vida, incluidos los que
+    empezaron después que él.
+    """
+    global _tracemalloc_propio
+    with _tracemalloc_lock:
+        if not _perfiles_activos and not tracemalloc.is_tracing():
+            tracemalloc.start(MARCOS_MEMORIA)
+            _tracemalloc_propio = True
+        _perfiles_activos.add(perfil)
+        for activo in _perfiles_activos:
+            activo.simultaneos = max(activo.simultaneos, len(_perfiles_activos))
+
+def _finalizar_tracemalloc(perfil):
+    """Toma las estadísticas de memoria y libera el perfil; detiene tracemalloc con el último"""
+    global _tracemalloc_propio
+    with _tracemalloc_lock:
+        memoria_actual, memoria_pico = tracemalloc.get_traced_memory()
+        estadisticas = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        )).statistics('lineno')
+        _perfiles_activos.discard(perfil)
+        if not _perfiles_activos and _tracemalloc_propio:
+            tracemalloc.stop()
+            _tracemalloc_propio = False
+    return memoria_actual, memoria_pico, estadisticas
+
+
+class Perfil:
+    """Perfil de CPU por muestreo, memoria y tiempos por sección de los hilos seguidos"""
+
+    def __init__(self, nombre, intervalo=INTERVALO_MUESTREO):
+        self.nombre = nombre
+        self.intervalo = intervalo
+        self.hilos = {threading.get_ident()}
+        self.pilas = Counter()
+        self.secciones = Counter()
+        self.archivos = {}
+        self._detener = threading.Event()
+        self._muestreador = threading.Thread(target=self._muestrear, name='perfil-muestreo', daemon=True)
+        self._anterior = None
+        self.simultaneos = 1
+
+    def __enter__(self):
+        _iniciar_tracemalloc(self)
+        self.inicio = time.perf_counter()
+        self._anterior = getattr(_local, 'perfil', None)
+        _local.perfil = self
+        self._muestreador.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._muestreador.join()
+        self.duracion = time.perf_counter() - self.inicio
+        _local.perfil = self._anterior
+
+        memoria_actual, memoria_pico, estadisticas = _finalizar_tracemalloc(self)
+
+        self.memoria = {
+            'actual_bytes': memoria_actual,
+            'pico_bytes': memoria_pico,
+            'lineas': [
+                {'ubicacion': str(estadistica.traceback), 'bytes': estadistica.size, 'asignaciones': estadistica.count}
+                for estadistica in estadisticas[:LINEAS_MEMORIA]
+            ]
+        }
+        self.guardar()
+        return False
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            marcos = sys._current_frames()
+            for hilo in tuple(self.hilos):
+                marco = marcos.get(hilo)
+                pila = []
+                while marco is not None:
+                    codigo = marco.f_code
+                    pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    marco = marco.f_back
+                if pila:
+                    self.pilas[';'.join(reversed(pila))] += 1
+
+    def texto_collapsed(self):
+        return ''.join(f"{pila} {cantidad}\n" for pila, cantidad in self.pilas.most_common())
+
+    def texto_resumen(self):
+        return json.dumps({
+            'nombre': self.nombre,
+            'duracion_s': self.duracion,
+            'muestras': sum(self.pilas.values()),
+            'intervalo_s': self.intervalo,
+            'secciones_s': dict(self.secciones),
+            # Máximo de perfiles a la vez durante este; mayor a 1: la memoria incluye la de los otros
+            'perfiles_simultaneos': self.simultaneos,
+            'memoria': self.memoria
+        }, ensure_ascii=False, indent=2)
+
+    def guardar(self, directorio=DIRECTORIO_PERFILES):
+        """Guarda el perfil collapsed y el resumen JSON; deja las rutas en self.archivos"""
+        os.makedirs(directorio, exist_ok=True)
+        base = os.path.join(directorio, f"{self.nombre}_{datetime.now():%Y%m%d_%H%M%S_%f}")
+        self.archivos = {'collapsed': f"{base}.collapsed.txt", 'resumen': f"{base}.json"}
+        with open(self.archivos['collapsed'], 'w', encoding='utf-8') as f:
+            f.write(self.texto_collapsed())
+        with open(self.archivos['resumen'], 'w', encoding='utf-8') as f:
+            f.write(self.texto_resumen())
+
+
+def perfilar(nombre, activo=None):
+    """Perfil del bloque si el perfilado está activo; si no, un nullcontext sin costo"""
+    if activo is None:
+        activo = perfil_solicitado()
+    return Perfil(nombre) if activo else nullcontext()
+
+@contextmanager
+def _medir(perfil, nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        perfil.secciones[nombre] += time.perf_counter() - inicio
+
+def seccion(nombre):
+    """Mide el tiempo del bloque dentro del perfil activo del hilo (no hace nada si no hay perfil)"""
+    perfil = getattr(_local, 'perfil', None)
+    return _medir(perfil, nombre) if perfil is not None else nullcontext()
+
+def en_hilo_perfilado(funcion):
+    """
+    Envuelve una función que se ejecutará en otro hilo para que el perfil activo
+    también muestree ese hilo mientras corre. Sin perfil activo devuelve la función tal cual.
+    """
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is None:
+        return funcion
+
+    def envoltura(*args, **kwargs):
+        hilo = threading.get_ident()
+        perfil.hilos.add(hilo)
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            perfil.hilos.discard(hilo)
+    return envoltura
+
+def informar(perfil):
+    """Muestra en stderr dónde quedaron los archivos de un perfil (para las CLI)"""
+    if perfil is not None:
+        print(f"🔎 Perfil de {perfil.nombre} ({perfil.duracion:.2f} s): {perfil.archivos['collapsed']} | "
+              f"{perfil.archivos['resumen']}", file=sys.stderr)
@@ -0,0 +1,237 @@
+import locale
+from datetime import datetime
+import pandas as pd
+
+# Columnas del CSV de Mis Comprobantes -> Emitidos que usa el análisis
+COLUMNAS_REQUERIDAS = [
+    'Fecha de Emisión', 'Tipo de Comprobante', 'Punto de Venta',
+    'Número Desde', 'Número Hasta', 'Nro. Doc. Receptor', 'Denominación Receptor', 'Imp. Total']
+
+# Tipo de comprobante de las Notas de Crédito C (restan facturación)
+TIPO_NOTA_CREDITO = 13
+
+
+class ColumnasFaltantesError(ValueError):
+    """El CSV no contiene todas las columnas requeridas"""
+
+    def __init__(self, columnas_faltantes):
+        self.columnas_faltantes = columnas_faltantes
+        super().__init__(f"Faltan las columnas: {', '.join(columnas_faltantes)}")
+
+    def __reduce__(self):
+        # Permite reconstruir la excepción al cruzar un pool de procesos
+        return self.__class__, (self.columnas_faltantes,)
+
+
+def configurar_locale():
+    """Establece el idioma español para la conversión de fechas"""
+    try:
+        # Attempt Windows locale setting
+        locale.setlocale(locale.LC_TIME, 'Spanish_Spain.1252')
+    except locale.Error:
+        try:
+            # Fallback to Linux locale setting
+            locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
+        except locale.Error:
+            # Use system default if specified locales are unavailable
+            locale.setlocale(locale.LC_TIME, '')
+
+# Función para determinar la fecha de próxima recategorización
+def obtener_proxima_recategorizacion(fecha_actual):
+    """
+    Determina la próxima fecha de recategorización según el mes actual.
+    Recategorización SEMESTRAL en ARCA:
+    - ENERO: evalúa período Jul-Dic del año anterior
+    - JULIO: evalúa período Ene-Jun del año actual
+
+    Por lo tanto:
+    - Si estamos en Jul-Dic: próxima recategorización = Enero del año siguiente
+    - Si estamos en Ene-Jun: próxima recategorización = Julio del año actual
+    """
+    mes_actual = fecha_actual.month
+    año_actual = fecha_actual.year
+
+    if mes_actual >= 7:  # Julio a Diciembre
+        # Próxima recategorización: Enero del próximo año
+        return datetime(año_actual + 1, 1, 1).date()
+    else:  # Enero a Junio
+        # Próxima recategorización: Julio del año actual
+        return datetime(año_actual, 7, 1).date()
+
+def obtener_inicio_periodo_recategorizacion(proxima_recategorizacion):
+    """Primer día de los 12 meses que evalúa la próxima recategorización"""
+    return datetime(proxima_recategorizacion.year - 1, proxima_recategorizacion.month, 1).date()
+
+def calcular_meses_restantes(fecha_max, proxima_recategorizacion):
+    """Calcula los meses completos entre la última factura y la próxima recategorización"""
+    # Restamos 1 porque no contamos el mes actual completo
+    meses_restantes = (proxima_recategorizacion.year - fecha_max.year) * 12 + \
+                     (proxima_recategorizacion.month - fecha_max.month) - 1
+    return max(0, meses_restantes)  # No puede ser negativo
+
+def _leer_encabezado(origen):
+    """Nombres de columna de la primera línea del CSV, sin espacios, comillas ni BOM"""
+    if hasattr(origen, 'read'):
+        datos = origen.read()
+        primera_linea = datos.split(b'\n', 1)[0]
+    else:
+        datos = origen
+        with open(origen, 'rb') as f:
+            primera_linea = f.readline()
+    encabezado = primera_linea.decode('utf-8').lstrip('\ufeff').rstrip('\r\n')
+    return datos, [col.strip().strip('"').strip() for col in encabezado.split(';')]
+
+def _leer_csv_pyarrow(origen):
+    """
+    Lee el CSV con el lector multihilo de pyarrow y un esquema explícito.
+
+    Los importes se leen como texto y se convierten con la configuración regional
+    de ARCA (punto de miles, coma decimal). Cualquier dato que no encaje en el
+    esquema lanza una excepción para que leer_csv_arca use pandas.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    datos, columnas = _leer_encabezado(origen)
+    columnas_faltantes = [col for col in COLUMNAS_REQUERIDAS if col not in columnas]
+    if columnas_faltantes:
+        raise ColumnasFaltantesError(columnas_faltantes)
+
+    tabla = pacsv.read_csv(
+        pa.BufferReader(datos) if isinstance(datos, bytes) else datos,
+        read_options=pacsv.ReadOptions(column_names=columnas, skip_rows=1, use_threads=True),
+        parse_options=pacsv.ParseOptions(delimiter=';'),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=COLUMNAS_REQUERIDAS,
+            column_types={
+                'Fecha de Emisión': pa.date32(),
+                'Tipo de Comprobante': pa.int64(),
+                'Punto de Venta': pa.int64(),
+                'Número Desde': pa.int64(),
+                'Número Hasta': pa.int64(),
+                'Nro. Doc. Receptor': pa.int64(),
+                'Denominación Receptor': pa.string(),
+                'Imp. Total': pa.string(),
+            }
+        )
+    )
+
+    for col in COLUMNAS_REQUERIDAS:
+        if col != 'Denominación Receptor' and tabla.column(col).null_count:
+            raise ValueError(f"Valores vacíos en '{col}'")
+
+    importes = pc.replace_substring(tabla.column('Imp. Total'), '.', '')
+    importes = pc.cast(pc.replace_substring(importes, ',', '.'), pa.float64())
+    tabla = tabla.set_column(tabla.schema.get_field_index('Imp. Total'), 'Imp. Total', importes)
+
+    # include_columns devuelve las columnas en el orden de COLUMNAS_REQUERIDAS
+    return tabla.to_pandas(date_as_object=False)
+
+def _leer_csv_pandas(origen):
+    df = pd.read_csv(origen, sep=';', encoding='utf-8', decimal=',', thousands='.')
+    df.columns = [col.strip() for col in df.columns]
+    return df
+
+def leer_csv_arca(origen, motor='auto'):
+    """
+    Lee el CSV exportado de ARCA y devuelve solo las columnas requeridas.
+
+    motor: 'pyarrow' (multihilo), 'pandas' o 'auto' (pyarrow con respaldo en
+    pandas si pyarrow no está instalado o el archivo no encaja en el esquema).
+    """
+    if motor in ('auto', 'pyarrow'):
+        posicion = origen.tell() if hasattr(origen, 'tell') else None
+        try:
+            return _leer_csv_pyarrow(origen)
+        except Exception:
+            if motor == 'pyarrow':
+                raise
+            if posicion is not None:
+                origen.seek(posicion)
+
+    df = _leer_csv_pandas(origen)
+
+    # Validar que las columnas requeridas existan
+    columnas_faltantes = [col for col in COLUMNAS_REQUERIDAS if col not in df.columns]
+    if columnas_faltantes:
+        raise ColumnasFaltantesError(columnas_faltantes)
+
+    return df[COLUMNAS_REQUERIDAS].copy()
+
+def codificar_receptores(df):
+    """
+    Clave entera de cada cliente: su Nro. Doc. Receptor.
+
+    Los comprobantes sin documento (vacío o 0, p. ej. consumidor final) se agrupan
+    por denominación con códigos negativos, para no mezclarlos en un único cliente.
+    """
+    documentos = pd.to_numeric(df['Nro. Doc. Receptor'], errors='coerce')
+    sin_documento = (documentos.isna() | (documentos <= 0)).to_numpy()
+
+    ids = documentos.fillna(0).to_numpy(dtype='int64')
+    if sin_documento.any():
+        codigos, _ = pd.factorize(df['Denominación Receptor'].to_numpy()[sin_documento])
+        ids[sin_documento] = -(codigos + 1)
+    return ids
+
+def construir_indice_receptores(df):
+    """Nombre canónico de cada ID Receptor: la denominación más usada con ese documento"""
+    conteo = df.groupby(['ID Receptor', 'Denominación Receptor'], sort=False).size().reset_index(name='n')
+    conteo = conteo.sort_values(['ID Receptor', 'n'], ascending=[True, False], kind='stable')
+    return conteo.drop_duplicates('ID Receptor').set_index('ID Receptor')['Denominación Receptor'].rename('Receptor')
+
+def normalizar_comprobantes(df):
+    """Normaliza tipos, invierte el signo de las notas de crédito y agrega las columnas Mes e ID Receptor"""
+    df['ID Receptor'] = codificar_receptores(df)
+    df['Nro. Doc. Receptor'] = df['Nro. Doc. Receptor'].astype(str)
+    fechas = pd.to_datetime(df['Fecha de Emisión'], format='%Y-%m-%d')
+    df['Fecha de Emisión'] = fechas.dt.date
+    df['Imp. Total'] = df['Imp. Total'].where(df['Tipo de Comprobante'] != TIPO_NOTA_CREDITO, -df['Imp. Total'])
+    df['Mes'] = fechas.dt.to_period('M')
+    return df
+
+def agrupar_facturacion_mensual(df):
+    """Agrupa la facturación por mes y calcula el acumulado"""
+    facturacion_mensual = df.groupby('Mes')['Imp. Total'].sum().reset_index()
+    facturacion_mensual['Mes_Period'] = facturacion_mensual['Mes']  # Guardar Period
+    facturacion_mensual['Mes'] = facturacion_mensual['Mes'].dt.to_timestamp()
+    facturacion_mensual['Mes_Str'] = facturacion_mensual['Mes'].dt.strftime('%Y-%m')
+    facturacion_mensual['Acumulado'] = facturacion_mensual['Imp. Total'].cumsum()
+    return facturacion_mensual
+
+def dividir_periodo(facturacion_mensual):
+    """Separa la facturación mensual en período histórico y actual"""
+    num_meses = len(facturacion_mensual)
+    if num_meses >= 6:
+        # Si hay 6 o más meses, separar en histórico (primeros) y actual (últimos)
+        mitad = num_meses // 2
+        return facturacion_mensual.iloc[:mitad].copy(), facturacion_mensual.iloc[mitad:].copy()
+    # Si hay menos de 6 meses, todo es período actual
+    return pd.DataFrame(), facturacion_mensual.copy()
+
+def procesar_comprobantes(df):
+    """
+    Procesa los comprobantes leídos del CSV de ARCA.
+
+    Devuelve la misma tupla que procesar_csv en la app: comprobantes normalizados,
+    facturación mensual, histórica y actual, fechas mínima y máxima, próxima
+    recategorización y meses restantes.
+    """
+    df = normalizar_comprobantes(df)
+    facturacion_mensual = agrupar_facturacion_mensual(df)
+
+    # Determinar fecha de última factura cargada
+    fecha_max = df['Fecha de Emisión'].max()
+    fecha_min = df['Fecha de Emisión'].min()
+
+    proxima_recategorizacion = obtener_proxima_recategorizacion(fecha_max)
+    meses_restantes = calcular_meses_restantes(fecha_max, proxima_recategorizacion)
+
+    facturacion_historica, facturacion_actual = dividir_periodo(facturacion_mensual)
+
+    return df, facturacion_mensual, facturacion_historica, facturacion_actual, fecha_min, fecha_max, proxima_recategorizacion, meses_restantes
+
+def resultado_vacio():
+    """Tupla de resultado cuando no hay archivo o el archivo es inválido"""
+    return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None, None, None, 0
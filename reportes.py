@@ -0,0 +1,260 @@
+"""
+Generación de reportes PDF de monotributo.
+
+Uso por lote (un PDF por cliente, en paralelo):
+
+    python reportes.py lote.csv --salida reportes/
+    python reportes.py lote.csv --salida reportes.zip --procesos 8
+
+El archivo de lote es un CSV separado por punto y coma con las columnas
+archivo;contribuyente;categoria, donde archivo es la ruta al CSV de
+Mis Comprobantes -> Emitidos de cada cliente.
+"""
+import argparse
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+from fpdf import FPDF, XPos, YPos
+
+from calculos import CATEGORIAS, calcular_resumen_recategorizacion
+from perfilado import informar, perfilar, seccion
+from procesamiento import configurar_locale, leer_csv_arca, procesar_comprobantes
+
+# Fuentes de cada bloque del reporte (fuentes core de FPDF, no requieren archivos)
+ESTILOS = {
+    'titulo': ('Helvetica', 'B', 20),
+    'seccion': ('Helvetica', 'B', 14),
+    'dato': ('Helvetica', '', 12),
+    'detalle': ('Helvetica', '', 11),
+    'tabla': ('Helvetica', '', 10),
+}
+
+# Caracteres que no pueden ir en un nombre de archivo (separadores de ruta incluidos)
+PATRON_NO_SEGURO = re.compile(r'[^\w.-]+')
+
+# Las fuentes core de FPDF solo cubren Latin-1: equivalentes de la tipografía habitual en nombres
+EQUIVALENTES_LATIN1 = str.maketrans({
+    '“': '"', '”': '"', '„': '"', '‘': "'", '’': "'", '‚': "'",
+    '–': '-', '—': '-', '…': '...', '•': '-', '€': 'EUR'
+})
+
+
+def texto_pdf(texto):
+    """Texto apto para las fuentes core de FPDF; lo que no tiene equivalente en Latin-1 queda como '?'"""
+    return str(texto).translate(EQUIVALENTES_LATIN1).encode('latin-1', 'replace').decode('latin-1')
+
+def _linea(pdf, alto, texto):
+    pdf.cell(0, alto, texto_pdf(texto), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+def construir_pdf_reporte(contribuyente, categoria_actual, resumen, facturacion_mensual,
+                          fecha_inicio_periodo, fecha_fin_periodo, fecha_recategorizacion,
+                          fecha_generacion=None):
+    """Construye el reporte PDF del análisis de recategorización y devuelve sus bytes"""
+    fecha_generacion = fecha_generacion or datetime.now()
+    meses_restantes = resumen['meses_restantes']
+
+    # Crear PDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    # Título
+    pdf.set_font(*ESTILOS['titulo'])
+    pdf.cell(0, 10, 'Reporte de Analisis de Monotributo', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+    pdf.ln(5)
+
+    # Información del contribuyente
+    pdf.set_font(*ESTILOS['seccion'])
+    _linea(pdf, 10, f'Contribuyente: {contribuyente}')
+    pdf.set_font(*ESTILOS['dato'])
+    _linea(pdf, 8, f'Categoria Actual: {categoria_actual}')
+    _linea(pdf, 8, f'Fecha de generacion: {fecha_generacion.strftime("%d/%m/%Y %H:%M")}')
+    pdf.ln(5)
+
+    # Período analizado
+    pdf.set_font(*ESTILOS['seccion'])
+    _linea(pdf, 10, 'Periodo Analizado')
+    pdf.set_font(*ESTILOS['detalle'])
+    _linea(pdf, 7, f'Desde: {fecha_inicio_periodo.strftime("%d/%m/%Y")}')
+    _linea(pdf, 7, f'Hasta: {fecha_fin_periodo.strftime("%d/%m/%Y")}')
+    _linea(pdf, 7, f'Meses cargados: {resumen["meses_cargados"]}')
+    _linea(pdf, 7, f'Proxima recategorizacion: {fecha_recategorizacion.strftime("%B %Y")}')
+    _linea(pdf, 7, f'Meses restantes: {meses_restantes}')
+    pdf.ln(5)
+
+    # Métricas principales
+    pdf.set_font(*ESTILOS['seccion'])
+    _linea(pdf, 10, 'Metricas Principales')
+    pdf.set_font(*ESTILOS['detalle'])
+    _linea(pdf, 7, f'Limite de categoria {categoria_actual}: ${resumen["limite_categoria"]:,.2f}')
+    _linea(pdf, 7, f'Facturacion total acumulada: ${resumen["facturacion_total"]:,.2f}')
+    _linea(pdf, 7, f'Margen disponible: ${resumen["margen_disponible"]:,.2f}')
+
+    if meses_restantes > 0:
+        _linea(pdf, 7, f'Promedio mensual disponible: ${resumen["promedio_mensual_disponible"]:,.2f}')
+
+    if resumen['exceso_facturacion'] > 0:
+        pdf.set_text_color(255, 0, 0)
+        _linea(pdf, 7, f'EXCESO de facturacion: ${resumen["exceso_facturacion"]:,.2f}')
+        if resumen['categoria_encuadre']:
+            _linea(pdf, 7, f'Nueva categoria de encuadre: {resumen["categoria_encuadre"]}')
+        pdf.set_text_color(0, 0, 0)
+
+    pdf.ln(5)
+
+    # Facturación mensual
+    pdf.set_font(*ESTILOS['seccion'])
+    _linea(pdf, 10, 'Facturacion Mensual')
+    pdf.set_font(*ESTILOS['tabla'])
+
+    for mes_str, importe in zip(facturacion_mensual['Mes_Str'], facturacion_mensual['Imp. Total']):
+        _linea(pdf, 6, f"{mes_str}: ${importe:,.2f}")
+
+    # Convertir bytearray a bytes (requerido por Streamlit)
+    return bytes(pdf.output())
+
+def nombre_archivo_reporte(contribuyente, fecha_generacion=None):
+    """Nombre de archivo del reporte PDF de un contribuyente, sin separadores de ruta ni caracteres no seguros"""
+    fecha_generacion = fecha_generacion or datetime.now()
+    nombre = PATRON_NO_SEGURO.sub('_', contribuyente).strip('._') or 'contribuyente'
+    return f"reporte_monotributo_{nombre}_{fecha_generacion.strftime('%Y%m%d')}.pdf"
+
+# =============================================================================
+# Generación por lote
+# =============================================================================
+
+def _inicializar_worker():
+    """Configuración que cada proceso del pool hace una sola vez"""
+    configurar_locale()
+
+def _generar_reporte_cliente(tarea):
+    """
+    Procesa el CSV de un cliente y construye su reporte. Se ejecuta en el pool.
+
+    Devuelve (nombre, pdf, latencia, error). Los errores vuelven como texto: algunas
+    excepciones (p. ej. las de fpdf) no se pueden reconstruir en el proceso principal
+    y romperían el pool entero, dejando sin reporte a todos los clientes pendientes.
+    """
+    inicio = time.perf_counter()
+    nombre = nombre_archivo_reporte(tarea['contribuyente'])
+    try:
+        # Con MONOTRIBUTO_PERFIL=1 cada proceso del pool guarda un perfil por reporte
+        with perfilar(f"reporte_{os.path.splitext(nombre)[0]}"):
+            with seccion('procesar_csv'):
+                df, facturacion_mensual, _, _, fecha_min, fecha_max, proxima_recategorizacion, meses_restantes = \
+                    procesar_comprobantes(leer_csv_arca(tarea['archivo']))
+            resumen = calcular_resumen_recategorizacion(facturacion_mensual, tarea['categoria'], CATEGORIAS, meses_restantes)
+            with seccion('pdf'):
+                pdf_bytes = construir_pdf_reporte(
+                    tarea['contribuyente'], tarea['categoria'], resumen, facturacion_mensual,
+                    fecha_min, fecha_max, proxima_recategorizacion
+                )
+    except Exception as e:
+        return nombre, None, time.perf_counter() - inicio, f"{type(e).__name__}: {e}"
+    return nombre, pdf_bytes, time.perf_counter() - inicio, None
+
+def leer_lote(ruta_lote):
+    """
+    Lee el archivo de lote y devuelve la lista de tareas. Una fila con categoría
+    inválida queda como tarea con 'error' y no se procesa.
+    """
+    lote = pd.read_csv(ruta_lote, sep=';', dtype=str).rename(columns=str.strip)
+    base = os.path.dirname(os.path.abspath(ruta_lote))
+    tareas = []
+    for fila in lote.itertuples(index=False):
+        archivo = fila.archivo if os.path.isabs(fila.archivo) else os.path.join(base, fila.archivo)
+        tarea = {'archivo': archivo, 'contribuyente': fila.contribuyente.strip(),
+                 'categoria': fila.categoria.strip().upper()}
+        if tarea['categoria'] not in CATEGORIAS:
+            tarea['error'] = f"Categoría inválida '{tarea['categoria']}'. Opciones: {', '.join(CATEGORIAS)}"
+        tareas.append(tarea)
+    return tareas
+
+def _nombre_unico(nombre, usados):
+    base, extension = os.path.splitext(nombre)
+    candidato, n = nombre, 1
+    while candidato in usados:
+        n += 1
+        candidato = f"{base}_{n}{extension}"
+    usados.add(candidato)
+    return candidato
+
+def generar_reportes_lote(tareas, salida, procesos=None):
+    """
+    Genera un reporte PDF por cliente usando un pool de procesos.
+
+    Si salida termina en .zip los reportes se guardan en ese archivo, si no en el
+    directorio indicado. Devuelve estadísticas de latencia por reporte y throughput.
+    """
+    en_zip = salida.lower().endswith('.zip')
+    if not en_zip:
+        os.makedirs(salida, exist_ok=True)
+
+    latencias, usados = [], set()
+    errores = [{'archivo': tarea['archivo'], 'error': tarea['error']} for tarea in tareas if 'error' in tarea]
+    inicio = time.perf_counter()
+    destino_zip = zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) if en_zip else None
+
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_worker) as pool:
+            futuros = {pool.submit(_generar_reporte_cliente, tarea): tarea for tarea in tareas if 'error' not in tarea}
+            for futuro in as_completed(futuros):
+                tarea = futuros[futuro]
+                try:
+                    nombre, pdf_bytes, latencia, error = futuro.result()
+                    if error is not None:
+                        errores.append({'archivo': tarea['archivo'], 'error': error})
+                        continue
+                    nombre = _nombre_unico(nombre, usados)
+                    if en_zip:
+                        destino_zip.writestr(nombre, pdf_bytes)
+                    else:
+                        with open(os.path.join(salida, nombre), 'wb') as f:
+                            f.write(pdf_bytes)
+                except Exception as e:
+                    # Un reporte que falla al generarse o al escribirse no corta el lote
+                    errores.append({'archivo': tarea['archivo'], 'error': str(e)})
+                    continue
+                latencias.append(latencia)
+    finally:
+        if destino_zip is not None:
+            destino_zip.close()
+
+    total = time.perf_counter() - inicio
+    serie = pd.Series(latencias, dtype=float)
+    return {
+        'reportes': len(latencias),
+        'errores': errores,
+        'segundos_totales': total,
+        'reportes_por_segundo': len(latencias) / total if total > 0 else 0,
+        'latencia_media': serie.mean() if len(serie) else 0,
+        'latencia_p95': serie.quantile(0.95) if len(serie) else 0,
+        'latencia_max': serie.max() if len(serie) else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un reporte PDF de monotributo por cliente")
+    parser.add_argument('lote', help="CSV con columnas archivo;contribuyente;categoria")
+    parser.add_argument('--salida', default='reportes', help="Directorio o archivo .zip de destino")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto, uno por CPU)")
+    args = parser.parse_args()
+
+    estadisticas = generar_reportes_lote(leer_lote(args.lote), args.salida, args.procesos)
+
+    print(f"Reportes generados: {estadisticas['reportes']} en {estadisticas['segundos_totales']:.2f} s "
+          f"({estadisticas['reportes_por_segundo']:.1f} reportes/s)")
+    print(f"Latencia por reporte: media {estadisticas['latencia_media'] * 1000:.0f} ms | "
+          f"p95 {estadisticas['latencia_p95'] * 1000:.0f} ms | máx {estadisticas['latencia_max'] * 1000:.0f} ms")
+    for error in estadisticas['errores']:
+        print(f"❌ {error['archivo']}: {error['error']}")
+
+if __name__ == "__main__":
+    # MONOTRIBUTO_PERFIL=1 guarda un perfil de CPU y memoria de la ejecución
+    with perfilar('reportes') as perfil:
+        main()
+    informar(perfil)
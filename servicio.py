@@ -0,0 +1,282 @@
+"""
+Servicio HTTP local de análisis de recategorización.
+
+Recibe el CSV de Mis Comprobantes -> Emitidos y devuelve el análisis en JSON.
+El parseo y los cálculos corren en un pool de procesos acotado, así el event
+loop de tornado nunca se bloquea; si hay demasiados análisis en curso el
+servicio responde 503 en lugar de encolar sin límite.
+
+La admisión se decide al recibir los encabezados, antes de leer el cuerpo:
+con Content-Length se rechaza con 413 un CSV más grande que --max-mb y con 503
+si no hay lugar (por cantidad de análisis o por los MB de cuerpos en memoria,
+--max-mb-en-curso). Así un pico de subidas grandes no llega a bufferearse.
+
+    python servicio.py --puerto 8888 --procesos 4 --max-en-curso 16 --max-mb 500 --max-mb-en-curso 1024
+
+Endpoints:
+    POST /analisis?categoria=B          CSV en el cuerpo (o multipart 'archivo'); responde el análisis
+    POST /trabajos?categoria=B          igual, pero responde 202 con el id del trabajo
+    GET  /trabajos/<id>                 estado y resultado del trabajo
+    GET  /salud                         análisis en curso y límites configurados
+"""
+import argparse
+import asyncio
+import io
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import tornado.httputil
+import tornado.web
+
+from calculos import CATEGORIAS, calcular_resumen_recategorizacion
+from procesamiento import (
+    ColumnasFaltantesError,
+    TIPO_NOTA_CREDITO,
+    configurar_locale,
+    leer_csv_arca,
+    procesar_comprobantes
+)
+
+# Cantidad de trabajos terminados que se conservan para consultar su resultado
+MAX_TRABAJOS_GUARDADOS = 1000
+
+
+def _a_json(valor):
+    """Convierte escalares de numpy y fechas a tipos serializables"""
+    if isinstance(valor, dict):
+        return {clave: _a_json(v) for clave, v in valor.items()}
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return valor
+
+def analizar_export(contenido, categoria_actual):
+    """Análisis completo de un CSV de ARCA. Se ejecuta en el pool de procesos."""
+    df, facturacion_mensual, _, _, fecha_min, fecha_max, proxima_recategorizacion, meses_restantes = \
+        procesar_comprobantes(leer_csv_arca(io.BytesIO(contenido)))
+    resumen = calcular_resumen_recategorizacion(facturacion_mensual, categoria_actual, CATEGORIAS, meses_restantes)
+    notas_de_credito = df[df['Tipo de Comprobante'] == TIPO_NOTA_CREDITO]
+
+    return _a_json({
+        'periodo': {
+            'desde': fecha_min,
+            'hasta': fecha_max,
+            'proxima_recategorizacion': proxima_recategorizacion
+        },
+        'categoria_actual': categoria_actual,
+        'resumen': resumen,
+        'facturacion_mensual': [
+            {'mes': mes, 'importe': float(importe), 'acumulado': float(acumulado)}
+            for mes, importe, acumulado in zip(facturacion_mensual['Mes_Str'],
+                                                facturacion_mensual['Imp. Total'],
+                                                facturacion_mensual['Acumulado'])
+        ],
+        'clientes_unicos': df['ID Receptor'].nunique(),
+        'notas_de_credito': {
+            'cantidad': len(notas_de_credito),
+            'total': float(notas_de_credito['Imp. Total'].sum())
+        }
+    })
+
+
+class ServicioAnalisis:
+    """Pool de procesos acotado y registro de trabajos asincrónicos"""
+
+    def __init__(self, procesos=None, max_en_curso=16, max_bytes=500 * 1024 * 1024,
+                 max_bytes_en_curso=1024 * 1024 * 1024):
+        self.procesos = procesos or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=configurar_locale)
+        self.max_en_curso = max_en_curso
+        self.max_bytes = max_bytes
+        self.max_bytes_en_curso = max_bytes_en_curso
+        self.en_curso = 0
+        self.bytes_en_curso = 0
+        self.trabajos = OrderedDict()
+
+    def admitir(self, tamaño=None):
+        """
+        Reserva un lugar para un análisis de `tamaño` bytes (sin Content-Length se
+        reserva el máximo) o responde 413/503. Devuelve los bytes reservados.
+        """
+        if tamaño is not None and tamaño > self.max_bytes:
+            raise tornado.web.HTTPError(413, reason=f"El CSV supera el máximo de {self.max_bytes // (1024 * 1024)} MB")
+        reserva = self.max_bytes if tamaño is None else tamaño
+        if self.en_curso >= self.max_en_curso or (self.en_curso and self.bytes_en_curso + reserva > self.max_bytes_en_curso):
+            raise tornado.web.HTTPError(503, reason="Demasiados análisis en curso, reintentar más tarde")
+        self.en_curso += 1
+        self.bytes_en_curso += reserva
+        return reserva
+
+    def liberar(self, reserva):
+        """Devuelve el lugar reservado con admitir()"""
+        self.en_curso -= 1
+        self.bytes_en_curso -= reserva
+
+    async def analizar(self, contenido, categoria):
+        """Ejecuta el análisis en el pool sin bloquear el event loop (requiere admitir() previo)"""
+        return await asyncio.get_running_loop().run_in_executor(self.pool, analizar_export, contenido, categoria)
+
+    def crear_trabajo(self, contenido, categoria, reserva):
+        """Lanza el análisis en segundo plano; el trabajo libera la reserva al terminar"""
+        id_trabajo = uuid.uuid4().hex
+        self.trabajos[id_trabajo] = {'estado': 'procesando'}
+        while len(self.trabajos) > MAX_TRABAJOS_GUARDADOS:
+            self.trabajos.popitem(last=False)
+        asyncio.get_running_loop().create_task(self._ejecutar_trabajo(id_trabajo, contenido, categoria, reserva))
+        return id_trabajo
+
+    async def _ejecutar_trabajo(self, id_trabajo, contenido, categoria, reserva):
+        try:
+            resultado = {'estado': 'completado', 'resultado': await self.analizar(contenido, categoria)}
+        except ColumnasFaltantesError as e:
+            resultado = {'estado': 'error', 'error': str(e), 'columnas_faltantes': e.columnas_faltantes}
+        except Exception as e:
+            resultado = {'estado': 'error', 'error': str(e)}
+        finally:
+            self.liberar(reserva)
+        if id_trabajo in self.trabajos:
+            self.trabajos[id_trabajo] = resultado
+
+    def cerrar(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ManejadorBase(tornado.web.RequestHandler):
+    def initialize(self, servicio):
+        self.servicio = servicio
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({'error': self._reason})
+
+
+@tornado.web.stream_request_body
+class ManejadorCarga(ManejadorBase):
+    """
+    Recibe un CSV admitiendo la solicitud en prepare(), antes de leer el cuerpo.
+    La reserva se libera al terminar la respuesta, salvo que se la pase a un trabajo.
+    """
+
+    def prepare(self):
+        self.reserva = None
+        self.partes = []
+        self.recibido = False
+        self.categoria = self.get_argument('categoria', '').strip().upper()
+        if self.request.method != 'POST':
+            return
+        if self.categoria not in CATEGORIAS:
+            raise tornado.web.HTTPError(400, reason=f"Categoría inválida. Opciones: {', '.join(CATEGORIAS)}")
+        longitud = self.request.headers.get('Content-Length')
+        self.reserva = self.servicio.admitir(int(longitud) if longitud and longitud.isdigit() else None)
+        self.request.connection.set_max_body_size(self.servicio.max_bytes)
+
+    def data_received(self, parte):
+        self.partes.append(parte)
+
+    def leer_solicitud(self):
+        """Categoría y contenido del CSV (cuerpo crudo o campo multipart 'archivo')"""
+        self.recibido = True
+        self.request.body, self.partes = b''.join(self.partes), []
+        tornado.httputil.parse_body_arguments(self.request.headers.get('Content-Type', ''), self.request.body,
+                                              self.request.body_arguments, self.request.files, self.request.headers)
+        archivos = self.request.files.get('archivo')
+        contenido = archivos[0]['body'] if archivos else self.request.body
+        if not contenido:
+            raise tornado.web.HTTPError(400, reason="No se recibió el archivo CSV")
+        return contenido, self.categoria
+
+    def _liberar(self):
+        if self.reserva is not None:
+            self.servicio.liberar(self.reserva)
+            self.reserva = None
+
+    def on_finish(self):
+        self._liberar()
+
+    def on_connection_close(self):
+        # El cliente cortó durante la subida: post() no va a correr
+        if not self.recibido:
+            self._liberar()
+
+
+class AnalisisHandler(ManejadorCarga):
+    async def post(self):
+        contenido, categoria = self.leer_solicitud()
+        try:
+            self.write(await self.servicio.analizar(contenido, categoria))
+        except ColumnasFaltantesError as e:
+            self.set_status(400)
+            self.write({'error': str(e), 'columnas_faltantes': e.columnas_faltantes})
+        except Exception as e:
+            self.set_status(400)
+            self.write({'error': f"Error al procesar el archivo CSV: {e}"})
+        finally:
+            self._liberar()
+
+
+class TrabajosHandler(ManejadorCarga):
+    def post(self):
+        contenido, categoria = self.leer_solicitud()
+        # La reserva pasa al trabajo, que la libera cuando termina el análisis
+        reserva, self.reserva = self.reserva, None
+        id_trabajo = self.servicio.crear_trabajo(contenido, categoria, reserva)
+        self.set_status(202)
+        self.set_header('Location', f"/trabajos/{id_trabajo}")
+        self.write({'id': id_trabajo, 'estado': 'procesando'})
+
+
+class TrabajoHandler(ManejadorBase):
+    def get(self, id_trabajo):
+        trabajo = self.servicio.trabajos.get(id_trabajo)
+        if trabajo is None:
+            raise tornado.web.HTTPError(404, reason="Trabajo inexistente")
+        self.write({'id': id_trabajo, **trabajo})
+
+
+class SaludHandler(ManejadorBase):
+    def get(self):
+        self.write({
+            'en_curso': self.servicio.en_curso,
+            'max_en_curso': self.servicio.max_en_curso,
+            'mb_en_curso': self.servicio.bytes_en_curso / (1024 * 1024),
+            'max_mb_en_curso': self.servicio.max_bytes_en_curso // (1024 * 1024),
+            'procesos': self.servicio.procesos
+        })
+
+
+def crear_aplicacion(servicio):
+    parametros = {'servicio': servicio}
+    return tornado.web.Application([
+        (r"/analisis", AnalisisHandler, parametros),
+        (r"/trabajos", TrabajosHandler, parametros),
+        (r"/trabajos/([0-9a-f]+)", TrabajoHandler, parametros),
+        (r"/salud", SaludHandler, parametros),
+    ])
+
+async def iniciar(puerto, procesos, max_en_curso, max_mb, max_mb_en_curso):
+    servicio = ServicioAnalisis(procesos, max_en_curso, max_mb * 1024 * 1024, max_mb_en_curso * 1024 * 1024)
+    aplicacion = crear_aplicacion(servicio)
+    aplicacion.listen(puerto, max_body_size=max_mb * 1024 * 1024)
+    print(f"Servicio de análisis en http://localhost:{puerto} "
+          f"({servicio.procesos} procesos, hasta {max_en_curso} análisis en curso)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        servicio.cerrar()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP de análisis de monotributo")
+    parser.add_argument('--puerto', type=int, default=8888)
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument('--max-en-curso', type=int, default=16, help="Análisis simultáneos antes de responder 503")
+    parser.add_argument('--max-mb', type=int, default=500, help="Tamaño máximo del CSV en MB")
+    parser.add_argument('--max-mb-en-curso', type=int, default=1024,
+                        help="MB de cuerpos recibidos en memoria entre todos los análisis en curso")
+    args = parser.parse_args()
+
+    asyncio.run(iniciar(args.puerto, args.procesos, args.max_en_curso, args.max_mb, args.max_mb_en_curso))
+
+if __name__ == "__main__":
+    main()
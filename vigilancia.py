@@ -0,0 +1,155 @@
+"""
+Ingesta automática de los CSV que se dejan en una carpeta compartida.
+
+Vigila la carpeta con watchdog y, cuando aparece o cambia un export de
+Mis Comprobantes -> Emitidos, calcula su huella (SHA-256 del contenido). Los
+archivos cuyo contenido ya se ingirió se saltean; el resto pasa por la misma
+normalización que procesar_csv y se carga en el almacén SQLite, que
+recalcula solo los meses afectados de ese cliente.
+
+El CUIT del cliente se toma del nombre del archivo (ARCA lo descarga como
+"Mis Comprobantes Emitidos - CUIT 20123456789.csv") o, si no está ahí, del
+nombre de la carpeta que lo contiene.
+
+    python vigilancia.py /ruta/compartida --base comprobantes.sqlite
+"""
+import argparse
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from almacen import Almacen
+from procesamiento import leer_csv_arca, normalizar_comprobantes
+
+PATRON_CUIT = re.compile(r'(?<!\d)(\d{11})(?!\d)')
+# Segundos sin cambios antes de procesar un archivo (evita leerlo a medio copiar)
+ESPERA_ESTABLE = 2.0
+
+
+def calcular_huella(ruta):
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    huella = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            huella.update(bloque)
+    return huella.hexdigest()
+
+def extraer_cuit(ruta):
+    """CUIT de 11 dígitos del nombre del archivo o de su carpeta, o None"""
+    for nombre in (os.path.basename(ruta), os.path.basename(os.path.dirname(ruta))):
+        coincidencia = PATRON_CUIT.search(nombre.replace('-', ''))
+        if coincidencia:
+            return coincidencia.group(1)
+    return None
+
+def _registro(mensaje):
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} | {mensaje}", flush=True)
+
+def ingerir_archivo(almacen, ruta):
+    """Ingiere un CSV si su contenido es nuevo. Devuelve la cantidad de comprobantes cargados."""
+    cuit = extraer_cuit(ruta)
+    if cuit is None:
+        _registro(f"⚠️ {ruta}: no se encontró el CUIT en el nombre del archivo ni de la carpeta")
+        return 0
+
+    huella = calcular_huella(ruta)
+    if almacen.huella_ingerida(huella):
+        return 0
+
+    inicio = time.perf_counter()
+    df = normalizar_comprobantes(leer_csv_arca(ruta))
+    cantidad = almacen.insertar_comprobantes(cuit, df)
+    almacen.registrar_archivo(os.path.abspath(ruta), huella, cuit, cantidad)
+
+    _registro(f"✅ {os.path.basename(ruta)}: {cantidad} comprobantes de {cuit} "
+              f"en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    if not almacen.contribuyente_registrado(cuit):
+        _registro(f"⚠️ {cuit} no está registrado; usar 'python almacen.py registrar' para indicar nombre y categoría")
+    return cantidad
+
+
+class ManejadorCSV(FileSystemEventHandler):
+    """Anota los CSV creados, modificados o movidos; el hilo principal los procesa"""
+
+    def __init__(self):
+        self.pendientes = {}
+        self.lock = threading.Lock()
+
+    def _anotar(self, ruta):
+        if ruta.lower().endswith('.csv'):
+            with self.lock:
+                self.pendientes[ruta] = time.monotonic()
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._anotar(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._anotar(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._anotar(event.dest_path)
+
+    def tomar_estables(self):
+        """Rutas sin eventos nuevos durante ESPERA_ESTABLE segundos"""
+        ahora = time.monotonic()
+        with self.lock:
+            estables = [ruta for ruta, ultimo in self.pendientes.items() if ahora - ultimo >= ESPERA_ESTABLE]
+            for ruta in estables:
+                del self.pendientes[ruta]
+        return estables
+
+
+def escanear(almacen, carpeta):
+    """Ingiere los CSV que ya están en la carpeta (los ya ingeridos se saltean por huella)"""
+    for directorio, _, archivos in os.walk(carpeta):
+        for archivo in sorted(archivos):
+            if archivo.lower().endswith('.csv'):
+                _procesar(almacen, os.path.join(directorio, archivo))
+
+def _procesar(almacen, ruta):
+    try:
+        ingerir_archivo(almacen, ruta)
+    except FileNotFoundError:
+        pass  # Borrado o renombrado antes de procesarlo
+    except Exception as e:
+        _registro(f"❌ {ruta}: {e}")
+
+def vigilar(carpeta, ruta_base):
+    # La conexión SQLite se usa solo desde este hilo; watchdog solo anota rutas
+    with Almacen(ruta_base) as almacen:
+        escanear(almacen, carpeta)
+
+        manejador = ManejadorCSV()
+        observador = Observer()
+        observador.schedule(manejador, carpeta, recursive=True)
+        observador.start()
+        _registro(f"👀 Vigilando {carpeta}")
+        try:
+            while True:
+                for ruta in manejador.tomar_estables():
+                    _procesar(almacen, ruta)
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            observador.stop()
+            observador.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta automática de CSV de ARCA desde una carpeta")
+    parser.add_argument('carpeta')
+    parser.add_argument('--base', default='comprobantes.sqlite', help="Almacén SQLite de destino")
+    args = parser.parse_args()
+    vigilar(args.carpeta, args.base)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Reducción de datos en el servidor antes de enviarlos al navegador.
+
+Los gráficos reciben como máximo una cantidad fija de puntos o barras y las
+tablas se paginan, así el tamaño de lo que se envía al frontend no crece con
+la cantidad de meses o días de historia cargados.
+"""
+import numpy as np
+import pandas as pd
+
+# Barras por gráfico mensual: por encima se agrupa en trimestres o años
+MAX_BARRAS = 36
+# Nombre del período de cada barra según la frecuencia de agregar_para_barras
+PERIODOS_BARRAS = {'M': 'Mes', 'Q': 'Trimestre', 'Y': 'Año'}
+# Puntos por gráfico de líneas: aproximadamente uno por píxel horizontal del gráfico
+MAX_PUNTOS_LINEA = 1000
+FILAS_POR_PAGINA = 50
+
+
+def lttb(x, y, max_puntos):
+    """
+    Índices de los puntos elegidos por Largest-Triangle-Three-Buckets.
+
+    Conserva la forma de la serie (picos y valles) mucho mejor que tomar uno
+    de cada N puntos. Siempre incluye el primer y el último punto.
+    """
+    n = len(y)
+    if max_puntos >= n or max_puntos < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('int64')
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+
+    # max_puntos - 2 buckets para los puntos interiores
+    limites = np.linspace(1, n - 1, max_puntos - 1).astype(np.int64)
+    indices = np.empty(max_puntos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    anterior = 0
+    for i in range(max_puntos - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        if i + 2 < len(limites):
+            siguiente = slice(limites[i + 1], limites[i + 2])
+            cx, cy = x[siguiente].mean(), y[siguiente].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+
+        areas = np.abs((x[anterior] - cx) * (y[inicio:fin] - y[anterior])
+                       - (x[anterior] - x[inicio:fin]) * (cy - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
+
+def reducir_serie(df, columna_x, columna_y, max_puntos=MAX_PUNTOS_LINEA):
+    """Filas de la serie elegidas con LTTB para graficar como línea"""
+    if len(df) <= max_puntos:
+        return df
+    return df.iloc[lttb(df[columna_x].to_numpy(), df[columna_y].to_numpy(), max_puntos)]
+
+def frecuencia_barras(facturacion_mensual, max_barras=MAX_BARRAS):
+    """Frecuencia de las barras de agregar_para_barras: 'M' (mes), 'Q' (trimestre) o 'Y' (año)"""
+    if len(facturacion_mensual) <= max_barras:
+        return 'M'
+    trimestres = facturacion_mensual['Mes'].dt.to_period('Q').nunique()
+    return 'Q' if trimestres <= max_barras else 'Y'
+
+def agregar_para_barras(facturacion_mensual, max_barras=MAX_BARRAS):
+    """
+    Facturación por período para un gráfico de barras (columnas Mes_Str e Imp. Total).
+
+    Si hay más meses que max_barras se agrupa por trimestre y, si aún sobran, por año
+    (ver frecuencia_barras para rotular el gráfico).
+    """
+    frecuencia = frecuencia_barras(facturacion_mensual, max_barras)
+    if frecuencia == 'M':
+        return facturacion_mensual[['Mes_Str', 'Imp. Total']]
+
+    periodos = facturacion_mensual['Mes'].dt.to_period(frecuencia)
+    agrupado = facturacion_mensual.groupby(periodos)['Imp. Total'].sum()
+    return pd.DataFrame({'Mes_Str': agrupado.index.astype(str), 'Imp. Total': agrupado.to_numpy()})
+
+def paginar(df, pagina, filas_por_pagina=FILAS_POR_PAGINA):
+    """Filas de una página (numerada desde 1) y la cantidad total de páginas"""
+    paginas = max(1, -(-len(df) // filas_por_pagina))
+    pagina = min(max(1, pagina), paginas)
+    inicio = (pagina - 1) * filas_por_pagina
+    return df.iloc[inicio:inicio + filas_por_pagina], paginas